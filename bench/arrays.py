@@ -0,0 +1,54 @@
+# Packed arrays against per-element `for` macros: sum, scale and filter
+#   python bench/arrays.py [size]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+LOOP = '''
+use lib/list.po
+zet items call range 0 {n}
+set total 0
+set kept []
+mac body 0
+    zet item index items for.i
+    add total item
+    set scaled item
+    add scaled item
+    assign items for.i scaled
+    zet big gt scaled {n}
+    if big add kept scaled
+end
+call for 0 {n} body
+'''
+
+VECTOR = '''
+zet items arange 0 {n}
+zet total vsum items
+zet items vmul items 2
+zet big vgt items {n}
+zet kept select items big
+'''
+
+def bench(source: str) -> float:
+    for name in ['List', 'List.init', 'List.init.fill', 'range', 'body']:
+        polang.Macros.pop(name, None)
+    for name in ['items', 'item', 'scaled', 'big', 'total', 'kept']:
+        polang.Variables.pop(name, None)
+    polang.program = polang.compile_source(source.split('\n'))
+    start = perf_counter()
+    polang.interpret(False, True)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 5
+    results = []
+    for name, source in [('for macro', LOOP), ('vector', VECTOR)]:
+        elapsed = bench(source.format(n=n))
+        results.append((polang.Variables['total'].value, len(polang.Variables['kept'].value)))
+        print(f'{name:<10} {n:>9} items  {elapsed:7.3f} s  {n / elapsed:12.0f} items/s')
+    assert results[0] == results[1], results
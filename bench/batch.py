@@ -0,0 +1,39 @@
+# Batch runner: a process per script against --batch on 1 and N workers
+#   python bench/batch.py [scripts] [jobs]
+import os
+import sys
+import subprocess
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+POLANG = [sys.executable, str(ROOT / 'polang.py')]
+
+SCRIPT = '''
+use {library}
+set total 0
+mac step 0
+    add total for.i
+end
+call for 0 {n} step
+out total
+'''
+
+def timed(command: list[str]) -> float:
+    start = perf_counter()
+    subprocess.run(command, check=False, capture_output=True)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        for s in range(count):
+            (Path(directory) / f'script{s}.po').write_text(SCRIPT.format(library=ROOT / 'lib' / 'list.po', n=20000 + s))
+        scripts = sorted(Path(directory).glob('*.po'))
+        runs = [('process', sum(timed(POLANG + [str(script)]) for script in scripts))]
+        for j in sorted({1, jobs}):
+            runs.append((f'--jobs={j}', timed(POLANG + [f'--batch={directory}', f'--jobs={j}', f'--prelude={ROOT / "lib" / "list.po"}'])))
+        for name, elapsed in runs:
+            print(f'{name:<10} {count:>5} scripts  {elapsed:7.3f} s  {count / elapsed:8.1f} scripts/s')
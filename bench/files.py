@@ -0,0 +1,64 @@
+# Files: summing a large file of numbers with READNUM (memory mapped, by blocks) against PUT from stdin
+#   python bench/files.py [megabytes]
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+CHUNKED = '''
+zet f open '{path}'
+set total 0
+set part 1
+mac step 0
+    zet chunk readnum f 1000000
+    zet part vsum chunk
+    add total part
+end
+call while gt part 0 step
+close f
+out total
+'''
+
+WHOLE = '''
+zet f open '{path}'
+zet numbers readnum f
+zet total vsum numbers
+out total
+'''
+
+PIPED = '''
+set numbers (array [])
+put numbers all
+zet total vsum numbers
+out total
+'''
+
+# A block of numbers repeated up to the size, its total is known
+def write_numbers(path: Path, megabytes: int) -> int:
+    block = ''.join(f'{n} {n * 7 % 1000}.5\n' for n in range(1, 100000))
+    data = block.encode()
+    repeats = max(1, megabytes * (1 << 20) // len(data))
+    with open(path, 'wb') as file:
+        for _ in range(repeats):
+            file.write(data)
+    return repeats * sum(n + n * 7 % 1000 + 0.5 for n in range(1, 100000))
+
+if __name__ == '__main__':
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'numbers.txt'
+        expected = write_numbers(path, megabytes)
+        size = path.stat().st_size / (1 << 20)
+        for name, source in [('readnum', CHUNKED), ('whole', WHOLE), ('put all', PIPED)]:
+            interpreter = polang.Interpreter()
+            start = perf_counter()
+            with open(path) as stdin:
+                result = interpreter.run(source.format(path=path), stdin=stdin)
+            elapsed = perf_counter() - start
+            assert abs(float(result.output) - expected) <= 1e-9 * expected, (result.output, expected)
+            print(f'{name:<8} {size:7.1f} MB  {elapsed:7.3f} s  {size / elapsed:7.1f} MB/s')
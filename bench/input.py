@@ -0,0 +1,56 @@
+# PUT: reading piped numbers line by line, through EACH, and in bulk into lists and arrays
+#   python bench/input.py [lines]
+import sys
+from io import StringIO
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+PROGRAMS = {
+    # One PUT per line, as scripts had to do before
+    'put': '''
+set line []
+mac read 0
+    put line
+end
+call for 0 {n} read
+zet total vsum line
+out total
+''',
+    'each': '''
+set line []
+set seen 0
+mac read 0
+    add seen 1
+end
+call each line read
+zet total vsum line
+out total
+''',
+    'put all': '''
+set lines []
+put lines all
+set count 0
+add count lines
+out count
+''',
+    'array': '''
+set numbers (array [])
+put numbers all
+zet total vsum numbers
+out total
+''',
+}
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = ''.join(f'{i} {i + 1} {i + 2}\n' for i in range(n))
+    for name, source in PROGRAMS.items():
+        interpreter = polang.Interpreter()
+        start = perf_counter()
+        result = interpreter.run(source.format(n=n), stdin=StringIO(data))
+        print(f'{name:<8} {n:>8} lines  {perf_counter() - start:7.3f} s  {result.output[:20]!r}')
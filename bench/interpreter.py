@@ -0,0 +1,47 @@
+# Many short scripts: one warm Interpreter reset between them against a process per script
+#   python bench/interpreter.py [scripts]
+import sys
+import subprocess
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+SCRIPT = '''
+use {library}
+zet numbers call range 0 {n}
+zet total sum numbers
+out total
+'''
+
+def in_process(scripts: list[str]) -> list[str]:
+    interpreter = polang.Interpreter()
+    outputs = []
+    for script in scripts:
+        interpreter.reset()
+        outputs.append(interpreter.run(script).output)
+    return outputs
+
+def processes(scripts: list[str]) -> list[str]:
+    outputs = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'script.po'
+        for script in scripts:
+            path.write_text(script)
+            outputs.append(subprocess.run([sys.executable, str(ROOT / 'polang.py'), str(path)], capture_output=True, text=True).stdout)
+    return outputs
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    scripts = [SCRIPT.format(library=ROOT / 'lib' / 'list.po', n=n) for n in range(count)]
+    results = []
+    for name, runner in [('process', processes), ('warm', in_process)]:
+        start = perf_counter()
+        results.append(runner(scripts))
+        elapsed = perf_counter() - start
+        print(f'{name:<8} {count:>6} scripts  {elapsed:7.3f} s  {count / elapsed:9.1f} scripts/s')
+    assert results[0] == results[1], (results[0][:3], results[1][:3])
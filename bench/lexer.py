@@ -0,0 +1,32 @@
+# Compile time of the benchmark programs, with the token cache cold and warm
+#   python bench/lexer.py [repeats]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+from scripts import LEXER
+
+PROGRAMS = [path.read_text().split('\n') for path in sorted((ROOT / 'bench' / 'programs').glob('*.po'))]
+SOURCE = [line for lines in PROGRAMS for line in lines] + (ROOT / 'lib' / 'list.po').read_text().split('\n')
+
+def compile_all(repeats: int) -> float:
+    start = perf_counter()
+    for _ in range(repeats):
+        polang.compile_source(SOURCE)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    LEXER.maxsize = 0
+    cold = compile_all(repeats)
+    LEXER.clear()
+    LEXER.maxsize = 1024
+    warm = compile_all(repeats)
+    info = LEXER.info()
+    lines = len(SOURCE) * repeats
+    print(f'cold  {cold / lines * 1e6:8.2f} us/line')
+    print(f'warm  {warm / lines * 1e6:8.2f} us/line  ({info["hits"]} hits, {info["misses"]} misses)')
@@ -0,0 +1,43 @@
+# List building: `add` in a loop, `range` and `List.init` from lib/list.po
+#   python bench/lists.py [size]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+ADD = '''
+set items []
+mac push 0
+    add items for.i
+end
+call for 0 {n} push
+'''
+
+RANGE = '''
+use lib/list.po
+zet items call range 0 {n}
+'''
+
+INIT = '''
+use lib/list.po
+zet items call List.init {n}
+'''
+
+INTERPRETER = polang.Interpreter(strict_errors=True, optimized=False)
+
+def bench(source: str) -> float:
+    INTERPRETER.reset() # lib/list.po is used again by every benchmark
+    start = perf_counter()
+    INTERPRETER.run(source)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    for name, source, size in [('add loop', ADD, n // 10), ('range', RANGE, n), ('List.init', INIT, n)]:
+        elapsed = bench(source.format(n=size))
+        assert len(INTERPRETER.variables['items'].value) == size
+        print(f'{name:<10} {size:>9} items  {elapsed:7.3f} s')
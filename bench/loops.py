@@ -0,0 +1,41 @@
+# Native loop throughput: `for` and `while` over 10^5 and 10^6 iterations
+#   python bench/loops.py [iterations ...]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+FOR = '''
+set total 0
+mac for.body 0
+    add total for.i
+end
+call for 0 {n} for.body
+'''
+
+WHILE = '''
+set i 0
+mac while.body 0
+    add i 1
+end
+call while lt i {n} while.body
+'''
+
+def bench(source: str) -> float:
+    polang.Macros.pop('for.body', None)
+    polang.Macros.pop('while.body', None)
+    polang.program = polang.compile_source(source.split('\n'))
+    start = perf_counter()
+    polang.interpret(False, True)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [10 ** 5, 10 ** 6]
+    for n in sizes:
+        for name, source in [('for', FOR), ('while', WHILE)]:
+            elapsed = bench(source.format(n=n))
+            print(f'{name:<6} {n:>9} iterations  {elapsed:7.3f} s  {n / elapsed:12.0f} it/s')
@@ -0,0 +1,44 @@
+# Per-call cost of templated macro bodies (fibonacci and range)
+#   python bench/macro_calls.py [repeats]
+import sys
+from io import StringIO
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+FIBONACCI = (ROOT / 'examples' / 'fibonacci.po').read_text().split('\n') + ['call fibonacci 0 1 1000000000000000000000']
+RANGE = (ROOT / 'lib' / 'list.po').read_text().split('\n') + ['zet r call range 0 100']
+
+def bench(lines: list[str], repeats: int) -> float:
+    calls = 0
+    resolve_macro = polang.resolve_macro
+    def counted_resolve(name, argc):
+        nonlocal calls
+        calls += 1
+        return resolve_macro(name, argc)
+
+    elapsed = 0.0
+    polang.resolve_macro = counted_resolve
+    try:
+        for _ in range(repeats):
+            snapshot = dict(polang.Macros)
+            polang.program = polang.compile_source(lines)
+            start = perf_counter()
+            with redirect_stdout(StringIO()):
+                polang.interpret(False, True)
+            elapsed += perf_counter() - start
+            polang.Macros.clear()
+            polang.Macros.update(snapshot)
+    finally:
+        polang.resolve_macro = resolve_macro
+    return elapsed / calls
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for name, lines in [('fibonacci', FIBONACCI), ('range', RANGE)]:
+        print(f'{name:<10} {bench(lines, repeats) * 1e6:8.2f} us/call')
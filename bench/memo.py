@@ -0,0 +1,47 @@
+# Memoized macros: naive recursive fibonacci with and without `memo`
+#   python bench/memo.py [n]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+SOURCE = '''
+mac fib 1
+    zet fib.r sum $1 0
+    zet fib.big gt $1 1
+    if fib.big call fib.both $1
+    ret fib.r
+end
+mac fib.both 1
+    zet fib.x call fib (sum $1 -1)
+    call fib.second (sum fib.x 0) $1
+end
+mac fib.second 2
+    zet fib.y call fib (sum $2 -2)
+    zet fib.r sum fib.y $1
+end
+{memo}
+zet result call fib {n}
+'''
+
+INTERPRETER = polang.Interpreter(strict_errors=True)
+
+def bench(source: str) -> float:
+    INTERPRETER.reset()
+    start = perf_counter()
+    INTERPRETER.run(source)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    results = []
+    for name, memo in [('plain', ''), ('memo', 'memo fib')]:
+        elapsed = bench(SOURCE.format(n=n, memo=memo))
+        results.append(INTERPRETER.variables['result'].value)
+        cache = INTERPRETER.macros['fib'][1].memo
+        print(f'{name:<6} fib {n:<4} {elapsed:8.4f} s  {cache if cache is not None else ""}')
+    assert results[0] == results[1], results
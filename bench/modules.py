@@ -0,0 +1,48 @@
+# USE: compiling a module, loading it from its .poc file and using it again in the same process
+#   python bench/modules.py [macros]
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+# A library of small macros in the style of lib/list.po
+def library(macros: int) -> str:
+    lines = []
+    for m in range(macros):
+        lines += [
+            f'mac lib.m{m} 2',
+            f'    set $1.value{m} $2',
+            f'    zet $1.twice{m} sum $2 $2',
+            f"    if (lt $2 {m}) out 'small {m}\\n'",
+            f'    ret $1.twice{m}',
+            'end',
+        ]
+    return '\n'.join(lines)
+
+INTERPRETER = polang.Interpreter()
+
+def use(path: Path, cold: bool, compiled_file: bool) -> float:
+    INTERPRETER.reset()
+    if cold:
+        polang.MODULES.clear()
+        polang.LEXER.clear()
+    if not compiled_file:
+        Path(polang.compiled_file_path(str(path))).unlink(missing_ok=True)
+    with INTERPRETER:
+        start = perf_counter()
+        polang.inst_use_polang_file(str(path))
+        return perf_counter() - start
+
+if __name__ == '__main__':
+    macros = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'library.po'
+        path.write_text(library(macros))
+        for name, cold, compiled_file in [('compile', True, False), ('.poc', True, True), ('cached', False, True)]:
+            elapsed = min(use(path, cold, compiled_file) for _ in range(5))
+            print(f'{name:<8} {macros * 6:>7} lines  {elapsed * 1e3:8.2f} ms')
@@ -0,0 +1,43 @@
+# Optimizer pass: a loop over constant conditions and small macro calls, with and without it
+#   python bench/optimizer.py [iterations]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+SOURCE = '''
+def LIMIT 100
+def STEP 2
+set total 0
+set flags 0
+mac bump 1
+    add total $1
+end
+mac body 0
+    if (lt STEP LIMIT) call bump STEP
+    zet half gt LIMIT 50
+    add flags half
+    not (eq (sum STEP STEP) 4) out 'unreachable'
+end
+call for 0 {n} body
+'''
+
+# The time and the variables left
+def bench(source: str, optimized: bool) -> tuple[float, dict[str, polang.Value]]:
+    interpreter = polang.Interpreter(optimized, strict_errors=True)
+    start = perf_counter()
+    interpreter.run(source)
+    return perf_counter() - start, interpreter.variables
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = []
+    for name, optimized in [('--no-opt', False), ('optimized', True)]:
+        elapsed, variables = bench(SOURCE.format(n=n), optimized)
+        results.append((variables['total'].value, variables['flags'].value))
+        print(f'{name:<10} {n:>9} iterations  {elapsed:7.3f} s  {n / elapsed:10.0f} it/s')
+    assert results[0] == results[1], results
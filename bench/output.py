@@ -0,0 +1,31 @@
+# OUT: printing a long list and many short lines with every --flush policy
+#   python bench/output.py [size]
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+
+SOURCE = '''
+use {library}
+zet numbers call range 0 {n}
+out numbers '\\n'
+mac line 0
+    out for.i ' ' 'item' '\\n'
+end
+call for 0 {n} line
+'''
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    source = SOURCE.format(library=ROOT / 'lib' / 'list.po', n=n)
+    with open(os.devnull, 'w') as null:
+        for policy in polang.FLUSH_POLICIES:
+            interpreter = polang.Interpreter(flush=policy)
+            start = perf_counter()
+            interpreter.run(source, stdout=null)
+            print(f'{policy:<6} {n:>8} items  {perf_counter() - start:7.3f} s')
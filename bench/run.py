@@ -0,0 +1,129 @@
+# Benchmark suite: runs bench/programs/*.po in process and compares with bench/baseline.json
+#   python bench/run.py [program ...] [--repeat=<n>] [--threshold=<ratio>] [--save]
+#
+#   --repeat     Timed runs per program, the fastest is kept (default 7).
+#   --threshold  Slowdown against the baseline reported as a regression (default 0.30,
+#                above the run to run noise of about 20%). Programs that run for a few
+#                milliseconds are only compared once they are MIN_SLOWDOWN slower.
+#   --save       Stores the results as the new baseline.
+# Save the baseline again whenever a change is meant to move the timings.
+import os
+import sys
+import json
+import subprocess
+import tracemalloc
+from statistics import median
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+PROGRAMS = ROOT / 'bench' / 'programs'
+BASELINE = ROOT / 'bench' / 'baseline.json'
+MIN_SLOWDOWN = 0.002 # Seconds
+sys.path.insert(0, str(ROOT))
+
+import polang
+from scripts import HOOKS, ON_LINE, ON_CALL
+
+INTERPRETER = polang.Interpreter(error_registry=True)
+
+def run(lines: list[str]) -> float:
+    INTERPRETER.reset()
+    start = perf_counter()
+    result = INTERPRETER.run(lines)
+    elapsed = perf_counter() - start
+    assert result.errors == [], '\n'.join(result.errors)
+    return elapsed
+
+def count(lines: list[str]) -> tuple[int, int]:
+    counters = {ON_LINE: 0, ON_CALL: 0}
+    def on_line(ins, frame):
+        counters[ON_LINE] += 1
+    def on_call(frame):
+        counters[ON_CALL] += 1
+    HOOKS.add(ON_LINE, on_line)
+    HOOKS.add(ON_CALL, on_call)
+    try:
+        run(lines)
+    finally:
+        HOOKS.remove(ON_LINE, on_line)
+        HOOKS.remove(ON_CALL, on_call)
+    return counters[ON_LINE], counters[ON_CALL]
+
+def peak_memory(lines: list[str]) -> int:
+    tracemalloc.start()
+    try:
+        run(lines)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# Interpreter start up: a fresh process running an empty program
+def startup_time(repeat: int) -> float:
+    command = [sys.executable, str(ROOT / 'polang.py'), str(ROOT / 'main.po')]
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        times.append(perf_counter() - start)
+    return median(times)
+
+def bench(path: Path, repeat: int) -> dict:
+    lines = path.read_text().split('\n')
+    executed, calls = count(lines)
+    elapsed = min([run(lines) for _ in range(repeat)])
+    return {
+        'time': elapsed,
+        'lines': executed,
+        'calls': calls,
+        'lines_per_sec': executed / elapsed,
+        'calls_per_sec': calls / elapsed,
+        'peak_memory': peak_memory(lines),
+    }
+
+def main(argv: list[str]) -> int:
+    repeat = 7
+    threshold = 0.30
+    save = False
+    names = []
+    for arg in argv:
+        if arg.startswith('--repeat='):
+            repeat = int(arg.split('=', 1)[1])
+        elif arg.startswith('--threshold='):
+            threshold = float(arg.split('=', 1)[1])
+        elif arg == '--save':
+            save = True
+        else:
+            names.append(Path(arg).stem)
+    paths = [path for path in sorted(PROGRAMS.glob('*.po')) if names == [] or path.stem in names]
+
+    os.chdir(ROOT) # Programs `use` libraries relative to the repository
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {'startup': startup_time(repeat), 'programs': {}}
+
+    regressions = []
+    print(f'{"program":<12} {"time ms":>10} {"lines/s":>12} {"calls/s":>12} {"peak KiB":>10} {"baseline":>10}')
+    for path in paths:
+        result = results['programs'][path.stem] = bench(path, repeat)
+        base = baseline.get('programs', {}).get(path.stem)
+        change = ''
+        if base is not None:
+            ratio = result['time'] / base['time'] - 1
+            change = f'{ratio:+.1%}'
+            if ratio > threshold and result['time'] - base['time'] > MIN_SLOWDOWN:
+                regressions.append(path.stem)
+                change += ' !'
+        print(f'{path.stem:<12} {result["time"] * 1e3:>10.2f} {result["lines_per_sec"]:>12.0f} {result["calls_per_sec"]:>12.0f} {result["peak_memory"] / 1024:>10.1f} {change:>10}')
+    print(f'{"startup":<12} {results["startup"] * 1e3:>10.2f}')
+
+    if save:
+        BASELINE.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'Baseline saved to {BASELINE.relative_to(ROOT)}')
+        return 0
+    if regressions:
+        print(f'Regressions over {threshold:.0%}: {", ".join(regressions)}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,52 @@
+# Server: a process per run against client.py requests to a warm --serve worker
+#   python bench/server.py [runs]
+import os
+import sys
+import time
+import subprocess
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import client
+
+SCRIPT = '''
+use lib/list.po
+zet numbers call range 0 100
+zet total sum numbers
+out total
+'''
+
+def timed(runs: int, command: list[str]) -> float:
+    start = perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, check=True, capture_output=True, cwd=ROOT, stdin=subprocess.DEVNULL)
+    return perf_counter() - start
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        script = Path(directory) / 'script.po'
+        script.write_text(SCRIPT)
+        sock = str(Path(directory) / 'polang.sock')
+        server = subprocess.Popen([sys.executable, str(ROOT / 'polang.py'), f'--serve={sock}', '--jobs=1', '--prelude=lib/list.po'], cwd=ROOT, stdout=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(sock):
+                time.sleep(0.01)
+            results = [
+                ('process', timed(runs, [sys.executable, str(ROOT / 'polang.py'), str(script)])),
+                ('client.py', timed(runs, [sys.executable, str(ROOT / 'client.py'), sock, str(script)])),
+            ]
+            start = perf_counter()
+            for _ in range(runs):
+                with open(os.devnull, 'w') as null:
+                    client.request(sock, {'path': str(script)}, null)
+            results.append(('request', perf_counter() - start))
+        finally:
+            server.terminate()
+            server.wait()
+        for name, elapsed in results:
+            print(f'{name:<10} {runs:>5} runs  {elapsed:7.3f} s  {elapsed / runs * 1e3:8.2f} ms/run')
@@ -0,0 +1,40 @@
+# Startup with a prelude: running it against restoring the --snapshot it left
+#   python bench/snapshot.py [macros]
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+from modules import library
+
+INTERPRETER = polang.Interpreter()
+
+def start(snapshot: Path, prelude: list[str], taken: bool) -> float:
+    if not taken:
+        snapshot.unlink(missing_ok=True)
+    INTERPRETER.reset()
+    polang.MODULES.clear()
+    polang.LEXER.clear()
+    for module in prelude:
+        Path(polang.compiled_file_path(module)).unlink(missing_ok=True)
+    with INTERPRETER:
+        begin = perf_counter()
+        polang.load_snapshot(str(snapshot), prelude)
+        return perf_counter() - begin
+
+if __name__ == '__main__':
+    macros = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as directory:
+        prelude = []
+        for name in ['first', 'second']:
+            path = Path(directory) / f'{name}.po'
+            path.write_text(library(macros).replace('lib.', f'{name}.'))
+            prelude.append(str(path))
+        snapshot = Path(directory) / 'prelude.snap'
+        for name, taken in [('prelude', False), ('snapshot', True)]:
+            elapsed = min(start(snapshot, prelude, taken) for _ in range(3))
+            print(f'{name:<9} {len(INTERPRETER.macros):>6} macros  {elapsed * 1e3:8.2f} ms')
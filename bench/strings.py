@@ -0,0 +1,41 @@
+# String building: `add` a piece at a time, `assign` characters and `join` a list
+#   python bench/strings.py [pieces]
+import sys
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+from scripts import Value
+
+def timed(label: str, function, n: int):
+    start = perf_counter()
+    result = function(n)
+    elapsed = perf_counter() - start
+    print(f'{label:<12} {n:>9} pieces  {elapsed:7.3f} s  {len(result):>10} chars')
+
+def add_pieces(n: int) -> str:
+    polang.Variables['bench.s'] = Value('')
+    piece = Value('line of report\n')
+    for _ in range(n):
+        polang.inst_add_value('bench.s', piece)
+    return polang.Variables['bench.s'].value
+
+def assign_chars(n: int) -> str:
+    polang.Variables['bench.s'] = Value('.' * n)
+    char = Value('x')
+    for i in range(n):
+        polang.inst_set_index_value('bench.s', Value(i), char)
+        polang.inst_get_index_value('bench.s', Value(i))
+    return polang.Variables['bench.s'].value
+
+def join_list(n: int) -> str:
+    return polang.inst_join_list(Value(['line of report\n'] * n)).value
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 5
+    timed('add', add_pieces, n)
+    timed('assign', assign_chars, n)
+    timed('join', join_list, n)
@@ -0,0 +1,65 @@
+# Value micro-benchmark: arithmetic, type checks, `out` and memory per Value
+#   python bench/values.py [iterations]
+import sys
+import tracemalloc
+from io import StringIO
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polang
+from scripts import Value
+
+def timed(label: str, function, iterations: int):
+    start = perf_counter()
+    function(iterations)
+    elapsed = perf_counter() - start
+    print(f'{label:<18} {elapsed / iterations * 1e9:10.1f} ns/op')
+
+def add_numbers(n: int):
+    polang.Variables['bench.n'] = Value(0)
+    one = Value(1)
+    for _ in range(n):
+        polang.inst_add_value('bench.n', one)
+
+def sub_numbers(n: int):
+    polang.Variables['bench.n'] = Value(0)
+    one = Value(1)
+    for _ in range(n):
+        polang.inst_sub_value('bench.n', one)
+
+def sum_values(n: int):
+    values = [Value(1), Value(2.5), Value(3)]
+    for _ in range(n):
+        polang.inst_sum_values(*values)
+
+def compare(n: int):
+    left, right = Value(1), Value(2)
+    for _ in range(n):
+        polang.inst_is_less(left, right)
+        polang.inst_typeof(left)
+
+def out_values(n: int):
+    values = [Value(42), Value('text'), Value(None), Value([1, 2, 3])]
+    with redirect_stdout(StringIO()):
+        for _ in range(n):
+            polang.inst_stdout(*values)
+
+def memory(n: int) -> float:
+    tracemalloc.start()
+    values = [Value(i) for i in range(n)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(values)
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    timed('add number', add_numbers, iterations)
+    timed('sub number', sub_numbers, iterations)
+    timed('sum values', sum_values, iterations)
+    timed('lt + type', compare, iterations)
+    timed('out values', out_values, iterations // 4)
+    print(f'{"memory":<18} {memory(iterations):10.1f} bytes/Value')
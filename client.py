@@ -0,0 +1,44 @@
+# Sends a program to a `polang.py --serve=<socket>` server and streams back its output
+#   python client.py <socket> <input.po | -> [args ...] [--warn]
+# `-` reads the program from stdin, otherwise stdin is sent as the program input.
+# Only the standard library is imported so the client starts fast.
+import os
+import sys
+import json
+import socket
+
+def request(path: str, message: dict, stdout=sys.stdout) -> tuple[int, list[str]]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps(message).encode() + b'\n')
+        with connection.makefile('rb') as file:
+            for line in file:
+                answer = json.loads(line)
+                if 'out' in answer:
+                    stdout.write(answer['out'])
+                    stdout.flush()
+                else:
+                    return answer['exit'], answer['warnings']
+    return -1, ['The server closed the connection']
+
+def main(argv: list[str]) -> int:
+    warn = '--warn' in argv
+    argv = [arg for arg in argv if arg != '--warn']
+    if len(argv) < 3:
+        print('USAGE:\n    client.py <socket> <input.po | -> [args ...] [--warn]')
+        return 0
+    message: dict = {'argv': argv[3:], 'cwd': os.getcwd()}
+    if argv[2] == '-':
+        message['source'] = sys.stdin.read()
+        message['stdin'] = ''
+    else:
+        message['path'] = os.path.abspath(argv[2])
+        message['stdin'] = '' if sys.stdin is None or sys.stdin.isatty() else sys.stdin.read()
+    exit_code, warnings = request(argv[1], message)
+    if warn:
+        for w in warnings:
+            print(f'[!] {w}')
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,11 +1,26 @@
+import os
+import sys
+import pickle
 from sys import exit
+from io import StringIO
+from time import perf_counter
+from typing import TextIO, Iterable
+from contextlib import redirect_stdout, redirect_stderr
+from copy import copy
+from threading import RLock
+from array import array
+from math import ceil
+from itertools import compress, repeat
+from operator import add, sub, mul, lt, gt, eq
 from scripts import *
 
-from icecream import ic
-
 Data = str | Value
 
 # Assistants
+# Array items are floats, whole ones are read back as integers
+def as_number(item: float) -> Number:
+    return int(item) if item.is_integer() else item
+
 def get_number(number: str) -> (Number | None):
     try:
         num = float(number)
@@ -31,70 +46,61 @@ def check_variable_list(instruction: str, *data: Data) -> list[Value]:
 def force_value(x):
     if isinstance(x, Value):
         return x
+    if x is None or (type(x) is int and x in SHARED_INTS):
+        return constant(x)
     return Value(x)
 
+# Lists and arrays are mutated in place, so variables never share one
+def copy_value(value):
+    return value[:] if type(value) is list or type(value) is array else value
+
 def is_float(number: int | float):
     return int(number) != number
 
+FALSY = [None, 0, '', [], array('d')]
+
+def is_true(value: Value) -> bool:
+    return value.value not in FALSY
+
 EXTENSION = '.po'
 RUNNING = True
 EXIT_CODE = 0
-X = -1
-
-SCOPE_STACK: list[str] = []
-def get_active_scope() -> (str | None):
-    if len(SCOPE_STACK) > 0:
-        return SCOPE_STACK[-1]
-    return None
 
 # Warnings & Errors
 warnings: list[str] = []
 errors: list[str] = []
 missing_lines = 0
 
-# Internal interpretation file
-file_content: list[str] = []
+# Internal interpretation program
+program: list[Instruction] = []
 
 Variables: dict[str, Value] = {
-    STRING: Value(STRING, True),
-    NUMBER: Value(NUMBER, True),
-    LIST:   Value(LIST, True),
-    NONE:   Value(None, True),
-    'true':  Value(1, True),
-    'false': Value(0, True),
-    'POLANG_VERSION': Value('1.10.2', True),
-    'NICE': Value(69, True),
+    STRING: constant(STRING),
+    NUMBER: constant(NUMBER),
+    LIST:   constant(LIST),
+    ARRAY:  constant(ARRAY),
+    NONE:   constant(None),
+    'true':  constant(1),
+    'false': constant(0),
+    'POLANG_VERSION': constant('1.10.2'),
+    'NICE': constant(69),
 }
 
-Macros: list[Macro] = [
-    Macro('while', 4, [
-        'zet while.expr $1 $2 $3',
-        'if while.expr call $4',
-        'if while.expr call while $1 $2 $3 $4',
-    ]),
-    
-    Macro('for', 3, [
-        'set for.i $1',
-        'zet for.expr lt $1 $2',
-        'if for.expr call $3',
-        'add for.i 1',
-        'if for.expr call for for.i $2 $3',
-    ])
-]
-
-def get_macros(name: str) -> (list[Macro] | None):
-    return None if len(mac_list := [mac for mac in Macros if mac.name == name]) == 0 else mac_list
+Macros: MacroTable = MacroTable()
+
+OUTPUT = Output()
+FILES = FileTable()
 
 # SET
 def inst_set_variable(name: str, data: Data) -> Value | None:
     left = Variables.get(name)
     right = check_variable('SET', data)
     if left is None:
-        Variables[name] = Value(right.value)
+        Variables[name] = Value(copy_value(right.value))
     else:
         assert not left.const, LOGIC_ERROR('Constant re declaration', f'Trying to re assign a constant value: {name} = {left.value}', 'SET')
         assert left.type == right.type, TYPE_ERROR(left, right, 'SET OP')
-        Variables[name].value = right.value
+        Variables[name].value = copy_value(right.value)
     return Value(Variables[name].type, True)
 
 # DEF
@@ -105,12 +111,16 @@ def inst_def_constant(name: str, data: Data) -> Value:
 
 # ADD
 def inst_add_value(name: str, *add_value: Data):
+    inst_return = copy_value(check_variable('ADD', name).value) # Catch the last value before addition
+    inst_add_statement(name, *add_value)
+    return inst_return
+
+# An ADD line drops its result, so strings, lists and arrays grow in place without a copy
+def inst_add_statement(name: str, *add_value: Data):
     left = check_variable('ADD', name)
     assert not left.const, LOGIC_ERROR('Constant assignment', f'Trying to add a value to a constant: {left}', 'ADD') 
     right = [check_variable('ADD', av) for av in add_value]
 
-    inst_return = left.value # Catch the last value before addition
-
     if left.type == NUMBER:
         for val in right:
             if val.type == NUMBER:
@@ -120,20 +130,94 @@ def inst_add_value(name: str, *add_value: Data):
             else:
                 RAISE(TYPE_ERROR(left, val, 'ADD'))
     elif left.type == STRING:
+        pieces = []
         for val in right:
             if val.type == NONE:
-                left.value += ' '  
+                pieces.append(' ')
             elif val.type == STRING:
-                left.value += val.value
+                pieces.append(val.value)
             elif val.type == NUMBER:
-                left.value += str(val.value)
+                pieces.append(str(val.value))
             else:
                 RAISE(TYPE_ERROR(left, right, 'ADD'))
+        left.append_text(pieces)
     elif left.type == LIST:
-        last = left.value
-        left.value = []
-        left.value = last + [val.value for val in right]
-    return inst_return
+        left.value.extend([list(val.value) if val is left else val.value for val in right])
+    elif left.type == ARRAY:
+        for val in right:
+            assert val.type == NUMBER, TYPE_ERROR(left, val, 'ADD')
+            left.value.append(val.value)
+
+# JOIN
+# Concatenates the items of a list in one pass: join <list> [separator]
+def inst_join_list(data: Data, *separator: Data) -> Value:
+    assert len(separator) <= 1, PARAM_ERROR('Wrong number of arguments', 'JOIN', '1 or 2', 1 + len(separator))
+    data = check_variable('JOIN', data)
+    assert data.type == LIST, TYPE_ERROR(data, Value(LIST), 'JOIN')
+    separator = check_variable('JOIN', separator[0]) if separator else Value('')
+    assert separator.type == STRING, TYPE_ERROR(separator, Value(STRING), 'JOIN')
+    pieces = []
+    for item in data.value:
+        if type(item) is str:
+            pieces.append(item)
+        elif item is None:
+            pieces.append(' ')
+        else:
+            assert type(item) in [int, float], TYPE_ERROR(data, Value(STRING), 'JOIN')
+            pieces.append(str(item))
+    return Value(separator.value.join(pieces))
+
+# EXTEND
+def inst_extend_list(name: str, *lists: Data):
+    left = check_variable('EXTEND', name)
+    assert not left.const, LOGIC_ERROR('Constant assignment', f'Trying to extend a constant: {left}', 'EXTEND')
+    assert left.type in [LIST, ARRAY], TYPE_ERROR(left, Value(LIST), 'EXTEND')
+    for val in check_variable_list('EXTEND', *lists):
+        assert val.type in [LIST, ARRAY], TYPE_ERROR(left, val, 'EXTEND')
+        left.value.extend(val.value[:] if val is left else as_array('EXTEND', val) if left.type == ARRAY else val.value)
+    return Value(len(left.value))
+
+# FILL
+# Appends `count` times the value, a step makes a number grow on every repetition:
+# fill list 3 0 2 --> [0, 2, 4]. A fractional count is rounded up, like the steps of FOR over it
+def inst_fill_list(name: str, *count_data_step: Data):
+    assert len(count_data_step) in [2, 3], PARAM_ERROR('Wrong number of arguments', 'FILL', '3 or 4', 1 + len(count_data_step))
+    count, data, step = (*count_data_step, None)[:3]
+    left = check_variable('FILL', name)
+    assert not left.const, LOGIC_ERROR('Constant assignment', f'Trying to fill a constant: {left}', 'FILL')
+    assert left.type in [LIST, ARRAY], TYPE_ERROR(left, Value(LIST), 'FILL')
+    count = check_variable('FILL', count)
+    assert count.type == NUMBER, TYPE_ERROR(count, Value(NUMBER), 'FILL')
+    data = check_variable('FILL', data)
+    assert left.type != ARRAY or data.type == NUMBER, TYPE_ERROR(left, data, 'FILL')
+    count = max(0, ceil(count.value))
+    if step is None:
+        left.value.extend([data.value] * count)
+    else:
+        step = check_variable('FILL', step)
+        assert data.type == NUMBER and step.type == NUMBER, TYPE_ERROR(data, step, 'FILL')
+        first, step = data.value, step.value
+        if type(first) is int and type(step) is int and step != 0:
+            left.value.extend(range(first, first + count * step, step))
+        else:
+            left.value.extend([first + i * step for i in range(count)])
+    return Value(len(left.value))
+
+# SLICE
+def inst_slice_value(sizeable: Data, start: Data, end: Data):
+    sizeable = check_variable('SLICE', sizeable)
+    assert sizeable.type in [LIST, STRING, ARRAY], ERROR_FORMAT('INDEX ', 'SLICE', 'Index access', f'Value type does not support slicing: {sizeable}')
+    start, end = check_variable_list('SLICE', start, end)
+    assert start.type == NUMBER and end.type == NUMBER, TYPE_ERROR(start, end, 'SLICE')
+    return Value(sizeable.value[int(start.value):int(end.value)])
+
+# CONCAT
+def inst_concat_lists(*lists: Data):
+    result = []
+    for val in check_variable_list('CONCAT', *lists):
+        assert val.type == LIST, TYPE_ERROR(Value(result), val, 'CONCAT')
+        result.extend(val.value)
+    return Value(result)
 
 # SUB
 def inst_sub_value(name: str, sub_value: Data):
@@ -164,6 +248,8 @@ def inst_sub_value(name: str, sub_value: Data):
             left.value = left.value[:-len(right.value)]
         else:
             RAISE(TYPE_ERROR(left, right, 'SUB'))
+    elif left.type == ARRAY:
+        RAISE(TYPE_ERROR(left, right, 'SUB'))
     return inst_return
     
 # SUM
@@ -171,7 +257,6 @@ def inst_sum_values(*data: Data):
     sum_type = None
     data = check_variable_list('SUM', *data)
     for d in data:
-        ic(sum_type, d)
         if sum_type is None:
             sum_type = d.type
             if sum_type == NUMBER:
@@ -180,6 +265,8 @@ def inst_sum_values(*data: Data):
                 sum_value = ''
             elif sum_type == LIST:
                 sum_value = []
+            elif sum_type == ARRAY:
+                sum_value = array('d')
         if sum_type == STRING and d.type is NONE:
             sum_value += ' '
         else:
@@ -188,34 +275,30 @@ def inst_sum_values(*data: Data):
     return sum_value
     
 # OUT
+# Written to the OUTPUT buffer, flushed as --flush says
 def inst_stdout(*data: Data):
     if len(data) == 0:
-        print()
-    
+        OUTPUT.write('\n')
+        return
     data = check_variable_list('OUT', *data)
-    
-    def print_value(value: Value):
-        if value.type == NONE:
-            print(' ', end='')
-        elif value.type == LIST:
-            print('[', end='')
-            size = len(value.value)
-            for v in range(size - 1):
-                print(value.value[v], end=', ')
-            if size > 0:
-                print(value.value[-1], end='')
-            print(']', end='')
-        else:
-            print(value.value, end='')
-        
-    for d in data:
-        print_value(d)
+    OUTPUT.write(''.join([render_value(value) for value in data]))
+
+def render_value(value: Value) -> str:
+    if value.type == NONE:
+        return ' '
+    elif value.type == LIST:
+        return f'[{", ".join([str(item) for item in value.value])}]'
+    elif value.type == ARRAY:
+        return f'[{", ".join([str(as_number(item)) for item in value.value])}]'
+    return str(value.value)
 
 # EXIT
 def inst_exit_program(exit_code: Data | None = None):
     exit_code = check_variable('EXIT', exit_code)
     global RUNNING, EXIT_CODE
     RUNNING = False
+    OUTPUT.flush()
+    FILES.flush()
     assert exit_code.type == NUMBER, LOGIC_ERROR('Exit code is not a number', f'--> {exit_code}', 'EXIT')
     EXIT_CODE = int(exit_code.value)
 
@@ -240,33 +323,260 @@ def inst_is_greater(left: Data, right: Data):
     return int(left.value > right.value)
     
 # PUT
-def inst_stdin(name: str):
+# put <name>: one line, a number for numbers and its chunks appended to lists and arrays
+# put <name> <count | all>: that many lines (every line left), one item per line for lists,
+# every number of them for arrays and the lines joined for strings
+def inst_stdin(name: str, *count: Data):
+    assert len(count) <= 1, PARAM_ERROR('Wrong number of arguments', 'PUT', '1 or 2', 1 + len(count))
     var = check_variable('PUT', name)
-    ic('INPUT', name, var)
+    OUTPUT.flush() # Prompts are shown before waiting
+    if count:
+        return store_lines(name, var, read_lines(count[0]))
     try:
         input_value = input()
     except EOFError:
         RAISE(ERROR_FORMAT('INPUT ', 'PUT', 'Keyboard interruption', 'perhaps you pressed Ctrl + C?'))
+    store_line(name, var, input_value)
+
+def store_line(name: str, var: Value, line: str):
     if var.type == NUMBER:
-        assert (number_compatible := get_number(input_value)) is not None, TYPE_ERROR(var, Value(input_value), 'PUT INS')
+        assert (number_compatible := get_number(line)) is not None, TYPE_ERROR(var, Value(line), 'PUT INS')
         inst_set_variable(name, Value(number_compatible))
     elif var.type == LIST:
-        chunks = input_value.split(' ')
-        tokens = [force_value(lex_chunk(value)) for value in chunks]
-        for value in tokens:
-            inst_add_value(name, value)
+        assert not var.const, LOGIC_ERROR('Constant assignment', f'Trying to add a value to a constant: {var}', 'PUT')
+        chunks = line.split()
+        if (numbers := parse_numbers(chunks)) is None:
+            numbers = [force_value(lex_chunk(chunk)).value for chunk in chunks]
+        var.value.extend(numbers)
+    elif var.type == ARRAY:
+        assert not var.const, LOGIC_ERROR('Constant assignment', f'Trying to add a value to a constant: {var}', 'PUT')
+        var.value.extend(parse_array(line))
+    else:
+        inst_set_variable(name, Value(line))
+
+def store_lines(name: str, var: Value, lines: list[str]):
+    assert not var.const, LOGIC_ERROR('Constant assignment', f'Trying to add a value to a constant: {var}', 'PUT')
+    if var.type == LIST:
+        var.value.extend(lines)
+    elif var.type == ARRAY:
+        var.value.extend(parse_array(' '.join(lines)))
+    elif var.type == STRING:
+        inst_set_variable(name, Value('\n'.join(lines)))
     else:
-        inst_set_variable(name, Value(input_value))  
+        RAISE(TYPE_ERROR(var, Value(LIST), 'PUT'))
+
+# Lines without their newline, None at the end of the input
+def read_line() -> (str | None):
+    line = sys.stdin.readline()
+    if line == '':
+        return None
+    return line[:-1] if line.endswith('\n') else line
+
+def read_lines(count: Data) -> list[str]:
+    if count == 'all':
+        return sys.stdin.read().splitlines()
+    count = check_variable('PUT', count)
+    assert count.type == NUMBER and count.value >= 0, LOGIC_ERROR('Invalid count', f'--> {count}', 'PUT')
+    lines = []
+    for _ in range(int(count.value)):
+        if (line := read_line()) is None:
+            break
+        lines.append(line)
+    return lines
+
+# Whitespace separated numbers in one pass, None when any chunk is not a number
+def parse_numbers(chunks: list[str]) -> (list[Number] | None):
+    try:
+        return list(map(int, chunks))
+    except ValueError:
+        pass
+    try:
+        return [integer if (integer := int(number)) == number else number for number in map(float, chunks)]
+    except (ValueError, OverflowError):
+        return None
+
+def parse_array(text: str) -> array:
+    try:
+        return array('d', map(float, text.split()))
+    except ValueError as error:
+        RAISE(TYPE_ERROR(Value(ARRAY), Value(str(error).rsplit(' ', 1)[-1]), 'PUT'))
+
+# NEXT
+# Reads the next line like PUT, 1 when there was one and 0 at the end of the input
+def inst_next_line(name: str) -> Value:
+    var = check_variable('NEXT', name)
+    OUTPUT.flush()
+    if (line := read_line()) is None:
+        return Value(0)
+    store_line(name, var, line)
+    return Value(1)
+
+# EACH
+# Calls the body for every line left in the input, read one at a time into the variable
+def inst_each_line(name: str, body: str):
+    var = check_variable('EACH', name)
+    OUTPUT.flush()
+    while RUNNING and (line := read_line()) is not None:
+        store_line(name, var, line)
+        inst_call_macro(body)
+
+# FILES
+# zet f open <path> [r | w | a] names the open file with a number, read files are memory mapped.
+# Writes are buffered until the file is closed, EXIT or the end of the program (which closes every file).
+def file_handle(instruction: str, data: Data, readable: bool | None = None) -> FileHandle:
+    handle = check_variable(instruction, data)
+    assert handle.type == NUMBER and (file := FILES.get(handle.value)) is not None, ERROR_FORMAT('FILE ', instruction, 'Not an open file', f'--> {handle}')
+    if readable is not None:
+        assert (file.mode == FILE_READ) == readable, ERROR_FORMAT('FILE ', instruction, f'Opened as \'{file.mode}\'', f'--> {file.path}')
+    return file
+
+# OPEN
+def inst_open_file(path: Data, *mode: Data) -> Value:
+    assert len(mode) <= 1, PARAM_ERROR('Wrong number of arguments', 'OPEN', '1 or 2', 1 + len(mode))
+    path = check_variable('OPEN', path)
+    mode = check_variable('OPEN', mode[0]) if mode else Value(FILE_READ)
+    assert path.type == STRING, TYPE_ERROR(path, Value(STRING), 'OPEN')
+    assert mode.value in FILE_MODES, ERROR_FORMAT('FILE ', 'OPEN', 'Invalid mode', f'--> {mode} (r, w or a)')
+    try:
+        return Value(FILES.open(path.value, mode.value))
+    except OSError as error:
+        RAISE(ERROR_FORMAT('FILE ', 'OPEN', 'Cannot open file', f'--> {path.value} ({error.strerror})'))
+
+# READ
+# The rest of the file
+def inst_read_file(data: Data) -> Value:
+    content = file_handle('READ', data, True).read()
+    return Value(content.decode('utf-8', 'replace') if content is not None else '')
+
+# READLN
+# Reads the next line of the file like NEXT: readln <file> <name>
+def inst_read_line(data: Data, name: str) -> Value:
+    file = file_handle('READLN', data, True)
+    var = check_variable('READLN', name)
+    if (line := file.line()) is None:
+        return Value(0)
+    store_line(name, var, line.decode('utf-8', 'replace'))
+    return Value(1)
+
+# READAT
+# A byte range of the file, the position is not moved: readat <file> <start> <size>
+def inst_read_range(data: Data, start: Data, size: Data) -> Value:
+    file = file_handle('READAT', data, True)
+    start, size = check_variable_list('READAT', start, size)
+    assert start.type == size.type == NUMBER and start.value >= 0 and size.value >= 0, LOGIC_ERROR('Invalid range', f'--> {start} {size}', 'READAT')
+    return Value(file.range(int(start.value), int(size.value)).decode('utf-8', 'replace'))
+
+# READNUM
+# An array with the next whitespace separated numbers (every one left by default): readnum <file> [count]
+def inst_read_numbers(data: Data, *count: Data) -> Value:
+    assert len(count) <= 1, PARAM_ERROR('Wrong number of arguments', 'READNUM', '1 or 2', 1 + len(count))
+    file = file_handle('READNUM', data, True)
+    limit = check_variable('READNUM', count[0]) if count else None
+    assert limit is None or (limit.type == NUMBER and limit.value >= 0), LOGIC_ERROR('Invalid count', f'--> {limit}', 'READNUM')
+    try:
+        return Value(file.numbers(array('d'), int(limit.value) if limit is not None else None))
+    except ValueError as error:
+        RAISE(ERROR_FORMAT('TYPE ', 'READNUM', 'Not a number', f'--> {error}'))
+
+# WRITE
+# Writes the values as OUT does: write <file> <value> ...
+def inst_write_file(data: Data, *values: Data):
+    file = file_handle('WRITE', data, False)
+    file.write(''.join([render_value(value) for value in check_variable_list('WRITE', *values)]))
+
+# CLOSE
+def inst_close_file(data: Data):
+    file_handle('CLOSE', data)
+    FILES.close(check_variable('CLOSE', data).value)
 
 # USE
-def inst_use_polang_file(line: int, module: str):
-    global file_content
+# A module runs once per process, `use <file> reload` runs it again (compiling it if it changed)
+def inst_use_polang_file(module: str, *options: str):
     assert module.endswith(EXTENSION), PARAM_ERROR('Input must be a polang file', 'USE')
-    with open(module, 'r') as polang_file:
-        lines = polang_file.read().split('\n')
-        file_content.pop(line)
-        file_content = file_content[:line + 1] + [''] + lines + file_content[line:]
-    return len(lines)
+    assert options in [(), ('reload',)], PARAM_ERROR('Unknown option', 'USE', 'reload', ' '.join(str(option) for option in options))
+    path = os.path.realpath(module)
+    if path in MODULES.loaded:
+        if not options:
+            return
+        forget_macros(MODULES.loaded[path])
+    module = load_module(path)
+    declared, loaded = macro_overloads(), set(MODULES.loaded)
+    MODULES.loaded[path] = []
+    try:
+        run_code(module.code)
+    finally:
+        # The modules it used keep the macros they added
+        for used in MODULES.loaded.keys() - loaded - {path}:
+            declared.update(MODULES.loaded[used])
+        MODULES.loaded[path] = sorted(macro_overloads() - declared)
+
+def macro_overloads() -> set[tuple[str, int]]:
+    return {(name, argc) for name, overloads in Macros.items() for argc in overloads}
+
+# The macros added by a module are declared again when it is reloaded,
+# the ones it failed to declare because they existed are kept
+def forget_macros(added: list[tuple[str, int]]):
+    for name, argc in added:
+        if (overloads := Macros.get(name)) is not None:
+            overloads.pop(argc, None)
+            if len(overloads) == 0:
+                Macros.pop(name)
+
+def load_module(path: str) -> Module:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        RAISE(ERROR_FORMAT('FILE ', 'USE', 'Cannot open module', f'--> {path}'))
+    if (module := MODULES.get(path, stat.st_mtime_ns)) is not None:
+        return module
+    functions = compiled_functions()
+    signature = compiled_signature()
+    if (code := load_code(path, stat, signature, functions)) is None:
+        code = compile_source(get_file_content(path))
+        save_code(path, stat, signature, functions, code)
+    module = Module(path, stat.st_mtime_ns, code)
+    MODULES.add(module)
+    return module
+
+# SNAPSHOT
+def take_snapshot() -> dict:
+    return {
+        'variables': dict(Variables),
+        'macros': {name: dict(overloads) for name, overloads in Macros.items()},
+        'modules': dict(MODULES.loaded),
+    }
+
+def restore_snapshot(state: dict):
+    Variables.clear()
+    Variables.update(state['variables'])
+    Macros.clear()
+    Macros.update(state['macros'])
+    MODULES.loaded.update(state['modules'])
+
+# Restores the snapshot, or runs the prelude (the one it was taken with by default) and takes it again
+def load_snapshot(path: str, prelude: list[str]):
+    functions = compiled_functions()
+    signature = compiled_signature()
+    data = read_snapshot(path, functions, signature)
+    if data is not None and not prelude:
+        prelude = data.get('prelude', [])
+    if data is not None and data.get('prelude') == prelude and 'state' in data:
+        restore_snapshot(data['state'])
+        return
+    assert len(prelude) > 0, ERROR_FORMAT('USAGE ', None, 'Invalid snapshot', f'{path} can not be rebuilt without --prelude=<file.po>,...')
+    for module in prelude:
+        inst_use_polang_file(module)
+    try:
+        write_snapshot(path, signature, functions, prelude, take_snapshot())
+    except (OSError, pickle.PicklingError, KeyError) as error:
+        warnings.append(f'Snapshot {path} was not written ({error}).')
+
+# What compiled code refers to, .poc files of another interpreter version are compiled again
+def compiled_functions() -> dict[str, function]:
+    return {name: entry[1] for name, entry in instructions.items()} | {f'{name} statement': function for name, function in STATEMENTS.items()} | {'RAISE': RAISE}
+
+def compiled_signature() -> str:
+    return f'{Variables["POLANG_VERSION"].value}:{",".join(f"{name}/{entry[0]}" for name, entry in instructions.items())}'
 
 # ZET
 def inst_set_variable_call(name: str, func_name: str, *args):
@@ -283,7 +593,7 @@ def inst_delete(*names: str):
         elif n in Variables:
             Variables.pop(n)
         elif n in Macros:
-            Macros.remove(n)
+            Macros.pop(n)
         else:
             warnings.append(f'Trying to DELETE an unknown name: {n}')
 
@@ -292,46 +602,42 @@ def inst_error(*args):
     RAISE(ERROR_FORMAT(f'{args[0]} ', *args[1:]))
 
 # MAC 
-def inst_macro(name: str, argc: Value | None):
+def inst_macro(name: str, argc: Value | None, code: list[str] | None = None, body: list | None = None, definitions: list[Instruction] | None = None):
     # assert name not in Variables, ERROR_FORMAT('NAME ', 'MAC DECLARATION', f'There\'s already a variable called', f'{name}')
-    if (macros := get_macros(name)) is not None:
-        for mac in macros:
-            assert mac.argc != argc, ERROR_FORMAT('NAME ', 'MAC DECLARATION', f'Macro already exists', f'{mac}')
+    argc = argc.value if argc is not None else X
+    if (macros := Macros.get(name)) is not None:
+        assert argc not in macros, ERROR_FORMAT('NAME ', 'MAC DECLARATION', f'Macro already exists', f'{macros.get(argc)}')
     
-    Macros.append(Macro(
-        name,
-        argc.value if argc is not None else X,
-    ))
-        
-    global SCOPE_STACK
-    SCOPE_STACK.append(name)
+    Macros.add(Macro(name, argc, code, body))
+    
+    # Nested macros are declared along with their container
+    for definition in definitions or []:
+        execute(definition)
     
 # END
 def inst_end_macro():
-    global SCOPE_STACK
-    
-    if get_active_scope() is not None:
-        SCOPE_STACK.pop()
-        Macros.sort(key=lambda x: (x.name, x.argc))
-    else:
-        warnings.append(f'Trying to END a macro that is not active.')
+    # Matching ENDs are consumed by the compiler
+    warnings.append(f'Trying to END a macro that is not active.')
 
 import re
 
+# A string written as a literal
+def quote(text: str) -> str:
+    return '\'' + text.replace('\\', '\\\\').replace('\'', '\\\'').replace('\n', '\\n').replace('\t', '\\t') + '\''
+
 # Format a line to match the arguments
 def format_line(line: str, func_name: str, *args: Value | str):
-    # ic(line, func_name, args)
     chunk_list = line.split(' ')
     for c, chunk in enumerate(chunk_list):
         if (match := re.match(r'\$(\d+)', chunk)) is not None:
             for g in match.groups():
-                if (template_num := int(g)) > len(args) and Macros[func_name][0] > X:
+                if (template_num := int(g)) > len(args) and X not in Macros.get(func_name, {}):
                     RAISE(ERROR_FORMAT('FUNCTION ', 'FUNCTION EXECUTION', 'Template argument exceed the total of arguments'))
                 try:
                     replace_arg = args[template_num - 1]
                     if isinstance(replace_arg, Value):
                         if replace_arg.type == STRING:
-                            replace_arg = '\'' + replace_arg.value + '\''
+                            replace_arg = quote(replace_arg.value)
                         else:
                             replace_arg = replace_arg.value
                         
@@ -346,25 +652,142 @@ def format_line(line: str, func_name: str, *args: Value | str):
         formated += str(c) + ' '
     return formated
                 
+def resolve_macro(name: str, argc: int) -> Macro:
+    assert name in Macros, ERROR_FORMAT('MACRO ', 'CALL', 'Object is not callable', f'{name}')
+    assert (selected := Macros.resolve(name, argc)) is not None, PARAM_ERROR('No overload matches', f'CALL {name}', list(Macros[name]), argc)
+    return selected
+
 # CALL
 def inst_call_macro(name: str, *argv):
-    assert (macros := get_macros(name)) is not None, ERROR_FORMAT('MACRO ', 'CALL', 'Object is not callable', f'{name}')
-    default_macro = None
-    for mac in macros:
-        if default_macro is None and mac.argc == X:
-            default_macro = mac
-        if len(argv) == mac.argc:
-            selected = mac
-            break
+    selected = resolve_macro(name, len(argv))
+    key, found, result = memo_lookup(selected, argv)
+    if found:
+        return result
+    if selected.native is not None:
+        return selected.native(*argv)
+    return run_frames(Frame(selected, argv, key=key))
+
+# MEMO
+# Caches the results of every overload of a pure macro: memo <name> [capacity]
+MEMO_CAPACITY = 128
+
+def inst_memoize_macro(name: str, *capacity: Data):
+    assert len(capacity) <= 1, PARAM_ERROR('Wrong number of arguments', 'MEMO', '1 or 2', 1 + len(capacity))
+    assert name in Macros, ERROR_FORMAT('MACRO ', 'MEMO', 'Doesn\'t exists', f'--> {name}')
+    size = check_variable('MEMO', capacity[0]) if capacity else Value(MEMO_CAPACITY)
+    assert size.type == NUMBER and size.value >= 1, LOGIC_ERROR('Invalid capacity', f'--> {size}', 'MEMO')
+    overloads = Macros[name]
+    for argc, mac in overloads.items():
+        assert mac.native is None, LOGIC_ERROR('Native macro', f'Cannot memoize {mac}', 'MEMO')
+        # Macros are shared with the tables the interpreter is reset to, their copy keeps the cache
+        overloads[argc] = copy(mac)
+        overloads[argc].memo = MemoCache(int(size.value))
+
+# Arguments are keyed by value, names by the value of their variable
+def memo_key(mac: Macro, argv: tuple[Value | str, ...]) -> (tuple | None):
+    key = [mac.name, mac.argc]
+    for arg in argv:
+        if isinstance(arg, str) and (var := Variables.get(arg)) is not None:
+            arg = var
+        if isinstance(arg, Value):
+            if arg.type not in [NUMBER, STRING, NONE]:
+                return None # Lists are not cached
+            key.append((arg.type, arg.value))
+        elif isinstance(arg, str):
+            key.append(arg)
         else:
-            selected = default_macro
-    for l, line in enumerate(selected.code):
-        exe_line = format_line(line, name, *argv)
-        ic(exe_line)
-        if (ret := evaluate_line(l + 1, exe_line)) is not None:
-            return ret
-    return None
+            return None
+    return tuple(key)
+
+def memo_lookup(mac: Macro, argv: tuple[Value | str, ...]) -> tuple[tuple | None, bool, Value | None]:
+    if mac.memo is None or (key := memo_key(mac, argv)) is None:
+        return None, False, None
+    found, result = mac.memo.lookup(key)
+    return key, found, Value(copy_value(result)) if result is not None else None
     
+# WHILE
+# Iterates in place, `while.expr` holds the last evaluated condition
+def inst_while_loop(func_name: str, left: Data, right: Data, body: str):
+    while RUNNING:
+        inst_set_variable_call('while.expr', func_name, left, right)
+        if not is_true(Variables['while.expr']):
+            break
+        inst_call_macro(body)
+        if not is_true(Variables['while.expr']):
+            break
+
+# FOR
+# `for.i` counts from start while it is lower than end (greater for a negative step),
+# it is incremented once more after the last check as the recursive version did
+def inst_for_loop(start: Data, end: Data, *step_body: Data):
+    assert len(step_body) in [1, 2], PARAM_ERROR('Wrong number of arguments', 'FOR', '3 or 4', 2 + len(step_body))
+    step = check_variable('FOR', step_body[0]) if len(step_body) == 2 else Value(1)
+    assert step.type == NUMBER and step.value != 0, LOGIC_ERROR('Invalid step', f'--> {step}', 'FOR')
+    compare = inst_is_less if step.value > 0 else inst_is_greater
+    body = step_body[-1]
+    
+    inst_set_variable('for.i', start)
+    while RUNNING:
+        inst_set_variable('for.expr', Value(compare('for.i', end)))
+        if is_true(Variables['for.expr']):
+            inst_call_macro(body)
+        inst_add_statement('for.i', step)
+        if not is_true(Variables['for.expr']):
+            break
+
+# ARRAY
+# Vector instructions work on whole arrays at once, lists of numbers are converted
+# and a number operand is repeated for every item
+def as_array(instruction: str, data: Value) -> array:
+    if data.type == ARRAY:
+        return data.value
+    assert data.type == LIST and all(type(item) in [int, float] for item in data.value), TYPE_ERROR(data, Value(ARRAY), instruction)
+    return array('d', data.value)
+
+def vector_operands(instruction: str, left: Data, right: Data) -> tuple[Iterable, Iterable]:
+    left, right = check_variable_list(instruction, left, right)
+    assert left.type != NUMBER or right.type != NUMBER, TYPE_ERROR(left, Value(ARRAY), instruction)
+    if left.type == NUMBER:
+        return repeat(left.value), as_array(instruction, right)
+    if right.type == NUMBER:
+        return as_array(instruction, left), repeat(right.value)
+    left, right = as_array(instruction, left), as_array(instruction, right)
+    assert len(left) == len(right), ERROR_FORMAT('SIZE ', instruction, 'Arrays of different size', f'{len(left)} != {len(right)}')
+    return left, right
+
+def vector_operation(operator: function, instruction: str) -> function:
+    def inst_vector(left: Data, right: Data) -> Value:
+        return Value(array('d', map(operator, *vector_operands(instruction, left, right))))
+    return inst_vector
+
+def vector_reduction(reduce: function, instruction: str) -> function:
+    def inst_reduce(data: Data) -> Value:
+        items = as_array(instruction, check_variable(instruction, data))
+        assert reduce is sum or len(items) > 0, ERROR_FORMAT('SIZE ', instruction, 'Empty array')
+        return Value(as_number(float(reduce(items))))
+    return inst_reduce
+
+def inst_make_array(data: Data) -> Value:
+    data = check_variable('ARRAY', data)
+    if data.type == NUMBER:
+        return Value(array('d', bytes(8 * max(0, int(data.value))))) # Zeros
+    return Value(array('d', as_array('ARRAY', data)))
+
+# ARANGE
+def inst_array_range(start: Data, end: Data, *step: Data) -> Value:
+    assert len(step) <= 1, PARAM_ERROR('Wrong number of arguments', 'ARANGE', '2 or 3', 2 + len(step))
+    start, end, step = check_variable_list('ARANGE', start, end, *step or [Value(1)])
+    assert start.type == end.type == step.type == NUMBER and step.value != 0, LOGIC_ERROR('Invalid range', f'--> {start} {end} {step}', 'ARANGE')
+    if all(type(val.value) is int for val in [start, end, step]):
+        return Value(array('d', range(start.value, end.value, step.value)))
+    count = max(0, ceil((end.value - start.value) / step.value))
+    return Value(array('d', [start.value + i * step.value for i in range(count)]))
+
+# SELECT
+def inst_select_mask(data: Data, mask: Data) -> Value:
+    items, mask = vector_operands('SELECT', data, mask)
+    return Value(array('d', compress(items, mask)))
+
 # MEMORY
 def inst_get_memory_variables():
     memory_str = ''
@@ -375,7 +798,7 @@ def inst_get_memory_variables():
 # MEMORY.FUNCTIONS
 def inst_get_memory_macros():
     func_str = ''
-    for mac in Macros:
+    for mac in Macros.macros():
         func_str += f'{mac}\n'
     return Value(func_str, True)
 
@@ -388,8 +811,12 @@ def inst_get_index_value(sizeable: Data, index_value: Data):
     try:
         if sizeable.type == NUMBER:
             return Value(float(str(sizeable.value)[int(index_value.value)]))
-        if sizeable.type in [STRING, LIST]:
-            return Value(sizeable.value[int(index_value.value)])            
+        if sizeable.type == STRING:
+            return Value(sizeable.char(int(index_value.value)))
+        if sizeable.type == LIST:
+            return Value(sizeable.value[int(index_value.value)])
+        if sizeable.type == ARRAY:
+            return Value(as_number(sizeable.value[int(index_value.value)]))
     except IndexError as inderr:
         RAISE(INDEX_ERROR(index_value.value, 'INDEX OP'))
 
@@ -397,7 +824,7 @@ def inst_get_index_value(sizeable: Data, index_value: Data):
 def inst_set_index_value(sizeable: Data, index_value: Data, new_value: Data):
     sizeable = check_variable('INDEX', sizeable)
     assert not sizeable.const, RAISE(ERROR_FORMAT('CONST ', 'ASSIGN', None, f'Cannot re assign a constant value: {sizeable}.'))
-    assert sizeable.type in [LIST, STRING], ERROR_FORMAT('INDEX ', 'ASSIGN', 'Index access', f'Value type does not support item assignment: {sizeable}')
+    assert sizeable.type in [LIST, STRING, ARRAY], ERROR_FORMAT('INDEX ', 'ASSIGN', 'Index access', f'Value type does not support item assignment: {sizeable}')
     index_value = check_variable('INDEX', index_value)
     assert index_value.type == NUMBER, TYPE_ERROR(f'{NUMBER}', index_value.value, 'ASSIGN')
     new_value = check_variable('ASSIGN', new_value)
@@ -405,24 +832,28 @@ def inst_set_index_value(sizeable: Data, index_value: Data, new_value: Data):
         index = int(index_value.value)
         if sizeable.type == LIST:
             sizeable.value[int(index_value.value)] = new_value.value
+        elif sizeable.type == ARRAY:
+            assert new_value.type == NUMBER, TYPE_ERROR(sizeable, new_value, 'ASSIGN')
+            sizeable.value[index] = new_value.value
         elif sizeable.type == STRING:
-            sizeable.value = sizeable.value[:index] + new_value.value + sizeable.value[index + 1:]
+            assert new_value.type == STRING, TYPE_ERROR(sizeable, new_value, 'ASSIGN')
+            sizeable.assign_char(index, new_value.value)
     except IndexError as inderr:
         RAISE(INDEX_ERROR(index_value.value, 'ASSIGN'))
 
 # IF / NOT
-def inst_eval_if(negate: bool, expression_value: Data, inst: str, *args):
+def check_condition(negate: bool, expression_value: Data, inst: str, *args) -> bool:
     expression_value = check_variable('IF EVAL', expression_value)
     assert (return_function := instructions.get(inst)) is not None, NAME_ERROR(inst, 'NOT CONDITION' if negate else 'IF CONDITION')
     if (argc := len(args)) > return_function[0] and return_function[0] > X:
         PARAM_ERROR('Too many arguments', 'IF CONDITION CALL', return_function[0], argc)
     if argc < return_function[0]:
         PARAM_ERROR('Not enough arguments', 'IF CONDITION CALL', return_function[0], argc)
-    if_eval = expression_value.value not in [None, 0, '', []]
-    if negate:
-        if_eval = not if_eval
-    if if_eval:
-        return_function[1](*args)
+    return is_true(expression_value) != negate
+
+def inst_eval_if(negate: bool, expression_value: Data, inst: str, *args):
+    if check_condition(negate, expression_value, inst, *args):
+        instructions[inst][1](*args)
 
 # RET
 def inst_return(*name_value: str | Data) -> Value:
@@ -442,26 +873,27 @@ def inst_assign_method(name: str, *macros: str):
             warnings.append(f'Not existing macro cannot be a method... ({mac}).')
         else:
             new_name = name + '.' + mac
-            inst_macro(new_name, Value(Macros[mac].argc - 1))
-            global SCOPE_STACK
-            SCOPE_STACK.pop()
-            for line in Macros[mac].code:
-                Macros[new_name].code.append(
-                    format_line(line, mac, name, *[f'${i}' for i in range(1, Macros[mac].argc + 1)])
-                )
-
-# VERIFIES IF A CHUNK IS SOMETHING
-def lex_chunk(chunk: str) -> (Value | str):
-    if (chunk[0] == '\'') and (chunk[-1] == '\''):
-        return Value(chunk[1:-1], False)
-    elif chunk == '.':
-        return Value()
-    elif (funk := get_number(chunk)) is not None:
-        return Value(funk, False)
-    elif chunk[0] == '[' and chunk[-1] == ']':
+            for overload in list(Macros[mac].values()):
+                code = [
+                    format_line(line, mac, name, *[f'${i}' for i in range(1, overload.argc + 1)])
+                    for line in overload.code
+                ]
+                inst_macro(new_name, Value(overload.argc - 1 if overload.argc > X else X), code, compile_body(code))
+
+# VERIFIES IF A TOKEN IS SOMETHING
+# Literals are shared by every execution of a compiled line, so they are constants
+def lex_token(token: Token) -> (Value | str):
+    if token.kind in [TOKEN_STRING, TOKEN_NUMBER]:
+        return constant(token.value)
+    elif token.kind == TOKEN_NONE:
+        return constant(None)
+    elif token.kind == TOKEN_LIST:
         return Value([], True)
     else:
-        return chunk
+        return token.text
+
+def lex_chunk(chunk: str) -> (Value | str):
+    return lex_token(lex_word(chunk))
 
 instructions: dict[str, tuple[int, function]] = {
     'str':   (1, lambda x: Value(str(x))),
@@ -471,6 +903,25 @@ instructions: dict[str, tuple[int, function]] = {
     'add':   (X, inst_add_value),
     'sub':   (2, inst_sub_value),
     'sum':   (X, inst_sum_values),
+    # lists
+    'extend': (X, inst_extend_list),
+    'fill':   (X, inst_fill_list),
+    'slice':  (3, inst_slice_value),
+    'concat': (X, inst_concat_lists),
+    'join':   (X, inst_join_list),
+    # arrays
+    'array':  (1, inst_make_array),
+    'arange': (X, inst_array_range),
+    'vadd':   (2, vector_operation(add, 'VADD')),
+    'vsub':   (2, vector_operation(sub, 'VSUB')),
+    'vmul':   (2, vector_operation(mul, 'VMUL')),
+    'vlt':    (2, vector_operation(lt, 'VLT')),
+    'vgt':    (2, vector_operation(gt, 'VGT')),
+    'veq':    (2, vector_operation(eq, 'VEQ')),
+    'vsum':   (1, vector_reduction(sum, 'VSUM')),
+    'vmin':   (1, vector_reduction(min, 'VMIN')),
+    'vmax':   (1, vector_reduction(max, 'VMAX')),
+    'select': (2, inst_select_mask),
     
     # functional
     'zet':    (X, inst_set_variable_call),
@@ -479,15 +930,31 @@ instructions: dict[str, tuple[int, function]] = {
     'end':    (X, inst_end_macro),
     'ret':    (X, inst_return),
     'call':   (X, inst_call_macro),
+    'memo':   (X, inst_memoize_macro),
     'method': (X, inst_assign_method),
 
     # conditionals
     'if':    (X, inst_eval_if),
     'not':   (X, inst_eval_if),
+    
+    # loops
+    'while': (4, inst_while_loop),
+    'for':   (X, inst_for_loop),
 
     # std out, in
     'out':   (X, inst_stdout),
-    'put':   (1, inst_stdin),
+    'put':   (X, inst_stdin),
+    'next':  (1, inst_next_line),
+    'each':  (2, inst_each_line),
+
+    # files
+    'open':    (X, inst_open_file),
+    'read':    (1, inst_read_file),
+    'readln':  (2, inst_read_line),
+    'readat':  (3, inst_read_range),
+    'readnum': (X, inst_read_numbers),
+    'write':   (X, inst_write_file),
+    'close':   (1, inst_close_file),
     
     # info
     'type':  (1, inst_typeof),
@@ -503,117 +970,842 @@ instructions: dict[str, tuple[int, function]] = {
     'assign': (3, inst_set_index_value),
 
     # expand
-    'use':   (1, inst_use_polang_file),
+    'use':   (X, inst_use_polang_file),
     
     'del':   (X, inst_delete),
     'exit':  (1, inst_exit_program),
 }
 
-def interpret_line(line_num: int, inst: str, chunks: list[str]):
-    tokens = [lex_chunk(c) for c in chunks[1:]]
-    if inst == 'if':
-        inst_eval_if(False, *tokens)
-    elif inst == 'not':
-        inst_eval_if(True, *tokens)
-    elif inst == 'call':
-        if (ret_value := inst_call_macro(*tokens)) is not None:
-            return ret_value
-    elif inst == 'ret':
-        return inst_return(*tokens)
-    elif inst == 'exit':
-        inst_exit_program(tokens[0])  
-    elif inst == 'use':
-        inst_use_polang_file(line_num, tokens[0])
-    else:
-        return force_value(instructions[inst][1](*tokens))
-
-def evaluate_expression(chunks: list[str], start_chunk: int, inst: str) -> tuple[int, Value]:
-    if chunks.count('(') > 1:
-        RAISE(ERROR_FORMAT('IMPLEMENTATION ', 'EXPRESSION', 'Not implemented yet.'))
-    eval_chunks = chunks[start_chunk:]
-    evaluation_line = eval_chunks[0] + ' '
-    for consumed, chunk in enumerate(eval_chunks[1:]):
-        evaluation_line += chunk + ' '
-        if chunk.endswith(')'):
-            return consumed + 2, evaluation_line[1:-2]
+# Functions of the lines whose result is dropped, nested and ZET instructions use the table above
+STATEMENTS: dict[str, function] = {
+    'add': inst_add_statement,
+}
+
+# Native macros
+Macros.add(Macro('while', 4, native=inst_while_loop))
+Macros.add(Macro('for', 3, native=inst_for_loop))
+Macros.add(Macro('for', 4, native=inst_for_loop))
+Macros.add(Macro('each', 2, native=inst_each_line))
+
+# The state every Interpreter starts with
+INITIAL_VARIABLES = dict(Variables)
+INITIAL_MACROS = {name: dict(overloads) for name, overloads in Macros.items()}
+
+# COMPILATION
+# Finds the `)` closing the `(` at the start token
+def closing_parenthesis(tokens: tuple[Token, ...], start: int, inst: str) -> int:
+    depth = 0
+    for t in range(start, len(tokens)):
+        if tokens[t].kind == TOKEN_OPEN:
+            depth += 1
+        elif tokens[t].kind == TOKEN_CLOSE:
+            depth -= 1
+            if depth == 0:
+                return t
     RAISE(SYNTAX_ERROR('Expression does not end', 'Expression encounter with the end of the line', inst.upper()))
 
-def evaluate_string(chunks: list[str], start_chunk: int, inst: str) -> tuple[int, Value]:
-    if chunks.count('\'') > 1:
-        RAISE(ERROR_FORMAT('NOOOOOOOOOOO ', 'NOOOOOOOOOOO', 'NOOOOOOOOOOO'))
-    string_chunks = chunks[start_chunk:]
-    string = ''
-    for consumed, chunk in enumerate(string_chunks):
-        string += chunk + ' '
-        if chunk.endswith('\'') or chunk == '\'':
-            return (consumed + 1, string[:-1])
-    ic(string)
-    RAISE(SYNTAX_ERROR('String does not end', 'String encounter with the end of line', inst.upper()))
-
-def evaluate_line(line_num: int, line: str):
-    ic(line_num, line)
-    chunks = line.split()
-    while '' in chunks:
-        chunks.remove('')
-    if chunks == [] or chunks[0] == '%':
-        return
-    args = len(chunks) - 1
+def compile_arguments(line_num: int, tokens: tuple[Token, ...], inst: str, template: bool = False) -> list[Value | str | Slot | Instruction]:
+    args = []
+    t = 0
+    while t < len(tokens):
+        token = tokens[t]
+        if token.kind == TOKEN_OPEN:
+            end = closing_parenthesis(tokens, t, inst)
+            args.append(compile_tokens(line_num, tokens[t + 1:end], template))
+            t = end
+        elif token.kind == TOKEN_CLOSE:
+            RAISE(SYNTAX_ERROR('Unbalanced parentheses', f'--> {" ".join([token.text for token in tokens])}', inst.upper()))
+        elif template and token.kind == TOKEN_SLOT:
+            args.append(Slot(*token.value))
+        else:
+            args.append(lex_token(token))
+        t += 1
+    return args
+
+def check_arguments(inst: str, argc: int):
+    # Infinite arguments
+    if (inst_paramc := instructions[inst][0]) < 0:
+        pass
+    elif inst_paramc < argc:
+        PARAM_ERROR(f'Too many arguments:', f'{inst}', f'{inst_paramc}', f'{argc}')
+    elif inst_paramc > argc:
+        PARAM_ERROR(f'Not enough arguments:', f'{inst}', f'{inst_paramc}', f'{argc}')
+
+def compile_tokens(line_num: int, tokens: tuple[Token, ...], template: bool = False, line: str | None = None) -> Instruction:
+    assert len(tokens) > 0 and (inst := tokens[0].text) in instructions.keys() and tokens[0].kind == TOKEN_NAME, SYNTAX_ERROR(f'First chunk is not a valid instruction', f'--> {tokens[0].text if tokens else "()"}', 'GLOBAL')
     
-    if len(SCOPE_STACK) > 0:
-        if chunks[0] == 'mac':
-            inst_macro(*[lex_chunk(chunk) for chunk in chunks[1:]])
-        elif chunks[0] == 'end':
-            inst_end_macro()
+    args = compile_arguments(line_num, tokens[1:], inst, template)
+    check_arguments(inst, len(args))
+    
+    if inst in ['if', 'not']:
+        args.insert(0, inst == 'not')
+    return Instruction(line_num, inst, instructions[inst][1], args, line if line is not None else ' '.join([token.text for token in tokens]))
+
+def compile_line(line_num: int, line: str, template: bool = False) -> (Instruction | None):
+    chunks = line.split(None, 1)
+    if chunks == [] or chunks[0] == '%':
+        return None
+    ins = compile_tokens(line_num, LEXER.tokenize(line), template, line)
+    if (function := STATEMENTS.get(ins.name)) is not None:
+        ins.function = function
+    return ins
+
+# Macro lines are compiled with their $n / $* templates located
+def compile_body_line(line_num: int, line: str) -> (Instruction | str | None):
+    try:
+        return compile_line(line_num, line, True)
+    except AssertionError:
+        return line # Formatted on every call, errors are raised then
+
+def compile_body(code: list[str]) -> list[Instruction | str]:
+    return [ins for line in code if (ins := compile_body_line(0, line)) is not None]
+
+def compile_source(lines: list[str]) -> list[Instruction]:
+    code: list[Instruction] = []
+    blocks: list[Instruction] = [] # Open macro declarations
+    for ln, line in enumerate(lines):
+        chunks = line.split()
+        if chunks == [] or chunks[0] == '%':
+            continue
+        if chunks[0] == 'end' and len(blocks) > 0:
+            blocks.pop()
+            continue
+        if len(blocks) > 0 and chunks[0] != 'mac':
+            blocks[-1].args[2].append(line)
+            blocks[-1].args[3].append(compile_body_line(ln, line))
+            continue
+        try:
+            ins = compile_line(ln, line)
+        except AssertionError as ass:
+            ins = Instruction(ln, None, RAISE, [str(ass)], line)
+        if ins.name == 'mac':
+            ins.args += [[], [], []] # code, body, nested definitions
+            (blocks[-1].args[4] if len(blocks) > 0 else code).append(ins)
+            blocks.append(ins)
         else:
-            get_macros(get_active_scope())[-1].code.append(line)
-    else:
-        assert (inst := chunks[0]) in instructions.keys(), SYNTAX_ERROR(f'First chunk is not a valid instruction', f'--> {inst}', SCOPE_STACK[-1] if SCOPE_STACK != [] else 'GLOBAL')
-        
-        for i, c in enumerate(chunks):
-            if c.startswith('('):
-                consumed, expr_result = evaluate_expression(chunks, i, inst)
+            code.append(ins)
+    return code
+
+# EXECUTION
+# Bare slots receive the caller's values (or names) as they are,
+# slots inside a bigger chunk build a new chunk: $1.value -> pepito.value
+def bind_slot(slot: Slot, frame: Frame) -> list[Value | str]:
+    argv = frame.argv
+    if slot.index == X:
+        if slot.bare:
+            return list(argv)
+        return [lex_chunk(chunk) for chunk in ' '.join([str(arg) for arg in argv]).join(slot.pieces).split()]
+    if slot.index > len(argv):
+        assert frame.macro.argc == X, ERROR_FORMAT('FUNCTION ', 'FUNCTION EXECUTION', 'Template argument exceed the total of arguments')
+        warnings.append(f'Argument ${slot.index} of {frame.macro.name} not provided.')
+        return []
+    if slot.bare:
+        return [argv[slot.index - 1]]
+    return [lex_chunk(str(argv[slot.index - 1]).join(slot.pieces))]
+
+def bind_arguments(ins: Instruction, frame: Frame) -> list:
+    args = []
+    for arg in ins.args:
+        if isinstance(arg, Slot):
+            args.extend(bind_slot(arg, frame))
+        elif isinstance(arg, Instruction):
+            args.append(evaluate(arg, frame))
+        else:
+            args.append(arg)
+    if len(args) != len(ins.args):
+        check_arguments(ins.name, len(args) - (ins.name in ['if', 'not']))
+    return args
+
+def arguments(ins: Instruction, frame: Frame | None = None) -> list:
+    if ins.templated:
+        return bind_arguments(ins, frame)
+    if ins.nested:
+        return [evaluate(arg) if isinstance(arg, Instruction) else arg for arg in ins.args]
+    return ins.args
+
+def execute(ins: Instruction, frame: Frame | None = None):
+    return ins.function(*arguments(ins, frame))
+
+def evaluate(ins: Instruction, frame: Frame | None = None) -> Value:
+    return force_value(execute(ins, frame))
+
+# CALL STACK
+MAX_CALL_DEPTH = 1000
+call_depth = 0 # Frames alive across every running stack
+
+def depth_error(name: str) -> str:
+    return ERROR_FORMAT('RECURSION ', 'CALL', 'Maximum call depth exceeded', f'{MAX_CALL_DEPTH} nested calls --> {name}')
+
+# Runs a macro and everything it calls on an explicit stack of frames.
+# `call` and `zet ... call` lines, also under `if/not`, push a frame instead of recursing,
+# and a call on the last line of a body reuses the current frame.
+# Calls nested in an expression, like `(call f)`, still recurse.
+# Where the macro and its arguments start in a ZET that calls one, 0 when it runs an instruction
+def zet_call(args: list) -> int:
+    if len(args) > 1 and isinstance(args[1], str):
+        if args[1] == 'call':
+            return 2
+        if args[1] not in instructions:
+            return 1
+    return 0
+
+def run_frames(root: Frame) -> (Value | None):
+    global call_depth
+    assert call_depth < MAX_CALL_DEPTH, depth_error(root.macro.name)
+    traced = HOOKS.active
+    stack = [root]
+    call_depth += 1
+    if traced:
+        HOOKS.emit(ON_CALL, root)
+    try:
+        while True:
+            frame = stack[-1]
+            body = frame.macro.body
+            ret = None
+            if frame.ip < len(body) and RUNNING:
+                line = body[frame.ip]
+                frame.ip += 1
+                # Lines that could not be compiled ahead are formatted on every call
+                if isinstance(line, str):
+                    exe_line = format_line(line, frame.macro.name, *frame.argv)
+                    if (line := compile_line(0, exe_line)) is None:
+                        continue
+                if traced:
+                    HOOKS.emit(ON_LINE, line, frame)
+                args = arguments(line, frame) if line.templated or line.nested else line.args
+                inst = line.name
                 
-                chunks = chunks[:i] + [str(evaluate_line(line_num, expr_result).value)] + chunks[i + consumed:]
-                return evaluate_line(line_num, ' '.join(chunks))
-
-        for i, c in enumerate(chunks):
-            if c.startswith('\''):
-                consumed, str_result = evaluate_string(chunks, i, inst)
-                chunks = chunks[:i] + [str_result] + chunks[i + consumed:]
-                args = len(chunks) - 1
-                ic(chunks)
-        
-        # Infinite arguments
-        if (inst_paramc := instructions[inst][0]) < 0:
-            pass
-        
-        elif inst_paramc < args:
-            PARAM_ERROR(f'Too many arguments:', f'{inst}', f'{inst_paramc}', f'{args}')
-        elif inst_paramc > args:
-            PARAM_ERROR(f'Not enough arguments:', f'{inst}', f'{inst_paramc}', f'{args}')
+                if inst == 'call':
+                    callee, argv, target, discard = args[0], args[1:], None, False
+                elif inst == 'zet' and (skip := zet_call(args)):
+                    callee, argv, target, discard = args[skip], args[skip + 1:], args[0], False
+                elif inst in ['if', 'not'] and len(args) > 2 and (args[2] == 'call' or (args[2] == 'zet' and (skip := zet_call(args[3:])))):
+                    if not check_condition(*args):
+                        continue
+                    if args[2] == 'call':
+                        callee, argv, target, discard = args[3], args[4:], None, True
+                    else:
+                        callee, argv, target, discard = args[3 + skip], args[4 + skip:], args[3], False
+                else:
+                    ret = line.function(*args)
+                    if inst != 'ret':
+                        continue
+                    callee = None
+                
+                if callee is not None:
+                    mac = resolve_macro(callee, len(argv))
+                    key, found, ret = memo_lookup(mac, argv) if mac.memo is not None else (None, False, None)
+                    if found:
+                        pass # The body is skipped
+                    elif mac.native is None:
+                        # Memoized frames are kept to store their result
+                        if frame.ip >= len(body) and target is None and key is None and frame.key is None:
+                            # Tail call
+                            if traced:
+                                HOOKS.emit(ON_RETURN, frame, None)
+                            frame.macro, frame.argv, frame.ip = mac, tuple(argv), 0
+                            frame.discard = frame.discard or discard
+                        else:
+                            assert call_depth < MAX_CALL_DEPTH, depth_error(callee)
+                            stack.append(frame := Frame(mac, tuple(argv), target, discard, key))
+                            call_depth += 1
+                        if traced:
+                            HOOKS.emit(ON_CALL, frame)
+                        continue
+                    else:
+                        ret = mac.native(*argv)
+                    if target is not None:
+                        inst_set_variable(target, force_value(ret))
+                        continue
+                    if discard or ret is None:
+                        continue
+            
+            # The frame returns, a value returned to a `call` line returns from its caller too
+            while True:
+                done = stack.pop()
+                call_depth -= 1
+                if done.key is not None and done.macro.memo is not None:
+                    done.macro.memo.store(done.key, copy_value(ret.value) if ret is not None else None)
+                if done.discard:
+                    ret = None
+                if traced:
+                    HOOKS.emit(ON_RETURN, done, ret)
+                if len(stack) == 0:
+                    return ret
+                if done.target is not None:
+                    inst_set_variable(done.target, force_value(ret))
+                    break
+                if ret is None:
+                    break
+    finally:
+        call_depth -= len(stack)
+        if traced:
+            for frame in reversed(stack):
+                HOOKS.emit(ON_RETURN, frame, None)
 
-        return interpret_line(line_num, inst, chunks)
-        
-def interpret(error_registry: bool, strict_errors: bool):
-    file_lines_q = len(file_content)
-    ln = 0
-    while ln < file_lines_q: 
+# OPTIMIZATION
+# A pass over the compiled program before it is interpreted (--no-opt skips it):
+#   pure instructions over literals and constants are folded into their result,
+#   IF / NOT over a known condition become their instruction or are removed,
+#   calls to small macros that call nothing are replaced by the macro lines.
+# Modules loaded by USE are not optimized, and a program that uses them
+# (or writes names through templates) only gets literals folded.
+PURE = ['eq', 'lt', 'gt', 'sum', 'str', 'type', 'index']
+REBINDING = ['set', 'def', 'zet', 'put', 'next', 'each'] # Other writes are refused on constants
+REMOVING = ['del', 'ret']
+CALLING = ['call', 'use', 'method', 'mac', 'ret', 'del', 'while', 'for', 'each']
+INLINE_LINES = 8
+
+# INLINE
+# The lines of a macro copied to its call site, traced as a call of the macro
+def inst_inline(name: str, argv: tuple[Value | str, ...], lines: tuple[Instruction, ...]):
+    if not HOOKS.active:
+        for line in lines:
+            if not RUNNING:
+                break
+            execute(line)
+        return
+    frame = Frame(resolve_macro(name, len(argv)), argv)
+    HOOKS.emit(ON_CALL, frame)
+    try:
+        for line in lines:
+            if not RUNNING:
+                break
+            HOOKS.emit(ON_LINE, line, frame)
+            execute(line)
+    finally:
+        HOOKS.emit(ON_RETURN, frame, None)
+
+def written_names(name: str, args: list) -> list:
+    if name in ['if', 'not']:
+        return written_names(args[2], args[3:]) if len(args) > 2 and isinstance(args[2], str) else [None]
+    if name in REMOVING:
+        return list(args)
+    if name == 'memo': # Memoized macros are not inlined
+        return args[:1]
+    if name in REBINDING:
+        return args[:1]
+    return []
+
+def render_argument(arg) -> str:
+    if isinstance(arg, Value):
+        if arg.type == STRING:
+            return quote(arg.value)
+        if arg.type == NONE:
+            return '.'
+        if arg.type == LIST and arg.value == []:
+            return '[]'
+        return str(arg)
+    if isinstance(arg, Instruction):
+        return f'({arg.text.strip()})'
+    return str(arg)
+
+def rebuild(ins: Instruction, name: str, args: list, function: function | None = None) -> Instruction:
+    indent = ins.text[:len(ins.text) - len(ins.text.lstrip())]
+    text = ' '.join([name] + [render_argument(arg) for arg in args if not isinstance(arg, bool)])
+    return Instruction(ins.line, name, function or instructions[name][1], args, indent + text)
+
+# Binds the slots of a macro line to the arguments of a call ahead of time,
+# the arguments may be the bare slots of the calling macro
+def substitute(ins: Instruction, frame: Frame) -> Instruction:
+    args = []
+    for arg in ins.args:
+        if isinstance(arg, Slot):
+            assert arg.bare or not any(isinstance(value, Slot) for value in frame.argv), 'Slot inside a chunk'
+            args.extend(bind_slot(arg, frame))
+        elif isinstance(arg, Instruction):
+            args.append(substitute(arg, frame))
+        else:
+            args.append(arg)
+    if len(args) != len(ins.args):
+        check_arguments(ins.name, len(args) - (ins.name in ['if', 'not']))
+    return rebuild(ins, ins.name, args, ins.function)
+
+def calls_macros(ins: Instruction) -> bool:
+    name, args = ins.name, ins.args
+    if name in ['if', 'not']:
+        if len(args) < 3 or not isinstance(args[2], str):
+            return True
+        name, args = args[2], args[3:]
+    if name in CALLING:
+        return True
+    if name == 'zet' and (len(args) < 2 or not isinstance(args[1], str) or args[1] == 'call' or args[1] not in instructions):
+        return True
+    return any(calls_macros(arg) for arg in args if isinstance(arg, Instruction))
+
+class Optimizer:
+    def __init__(self, program: list[Instruction]):
+        self.program = program
+        self.dynamic = False # Names may be written or removed where they can not be seen
+        self.written: dict[str, int] = {}
+        self.definitions: dict[tuple[str, int], list[tuple[Instruction, int]]] = {}
+        for position, ins in enumerate(program):
+            self.scan(ins, position)
+
+    def scan(self, ins: Instruction | str, position: int):
+        if isinstance(ins, str) or ins.name in ['use', 'method']:
+            self.dynamic = True
+            return
+        for name in written_names(ins.name, ins.args):
+            if isinstance(name, str):
+                self.written[name] = self.written.get(name, 0) + 1
+            else:
+                self.dynamic = True
+        if ins.name == 'mac':
+            # Nested macros are declared along with their container
+            name, argc = ins.args[0], ins.args[1]
+            if isinstance(name, str) and (argc is None or isinstance(argc, Value)):
+                self.definitions.setdefault((name, X if argc is None else argc.value), []).append((ins, position))
+            for line in ins.args[3] + ins.args[4]:
+                self.scan(line, position)
+        for arg in ins.args:
+            if isinstance(arg, Instruction):
+                self.scan(arg, position)
+
+    def optimize(self) -> list[Instruction]:
+        constants = {} if self.dynamic else {
+            name: value for name, value in Variables.items()
+            if value.const and value.type in [NUMBER, STRING, NONE] and name not in self.written
+        }
+        code = []
+        for position, ins in enumerate(self.program):
+            for ins in self.line(ins, constants, position, True):
+                code.append(ins)
+                # A constant defined once is known by every line after it
+                if ins.name == 'def' and not self.dynamic and isinstance(name := ins.args[0], str) and isinstance(value := ins.args[1], Value):
+                    if self.written.get(name) == 1 and name not in Variables and value.type in [NUMBER, STRING, NONE]:
+                        constants[name] = value
+        return code
+
+    def known(self, arg, constants: dict[str, Value]) -> (Value | None):
+        if isinstance(arg, Value):
+            return arg
+        if isinstance(arg, str):
+            return constants.get(arg)
+        return None
+
+    def evaluate(self, name: str, args: list, constants: dict[str, Value]) -> (Value | None):
+        if name == 'str':
+            operands = args if all(isinstance(arg, (str, Value)) for arg in args) else [None]
+        else:
+            operands = [self.known(arg, constants) for arg in args]
+        if None in operands:
+            return None
+        try:
+            value = force_value(instructions[name][1](*operands))
+        except Exception:
+            return None # Left for the error to be reported when it runs
+        if value.type not in [NUMBER, STRING, NONE]:
+            return None
+        return Value(value.value, True)
+
+    def fold(self, arg, constants: dict[str, Value]):
+        if not isinstance(arg, Instruction):
+            return arg
+        args = [self.fold(nested, constants) for nested in arg.args]
+        if arg.name in PURE and (value := self.evaluate(arg.name, args, constants)) is not None:
+            return value
+        return rebuild(arg, arg.name, args) if args != arg.args else arg
+
+    # The lines replacing one, inlined macro lines are spliced into macro bodies
+    # and kept together in an INLINE line at the top level
+    def line(self, ins: Instruction | str, constants: dict[str, Value], position: int, top: bool = False) -> list[Instruction | str]:
+        if isinstance(ins, str):
+            return [ins]
+        if ins.name == 'mac':
+            ins.args[4][:] = [line for definition in ins.args[4] for line in self.line(definition, constants, position)]
+            ins.args[3][:] = [line for body_line in ins.args[3] for line in self.line(body_line, dict(constants), position)]
+            return [ins]
+        args = [self.fold(arg, constants) for arg in ins.args]
+        if ins.name == 'zet' and len(args) > 1 and args[1] in PURE and (value := self.evaluate(args[1], args[2:], constants)) is not None:
+            return [rebuild(ins, 'set', [args[0], value])]
+        if ins.name in ['if', 'not'] and len(args) > 2 and isinstance(args[2], str) and (condition := self.known(args[1], constants)) is not None:
+            try:
+                check_condition(args[0], condition, *args[2:])
+            except AssertionError:
+                return [rebuild(ins, ins.name, args, ins.function)]
+            if is_true(condition) == args[0]:
+                return []
+            if args[2] != 'call': # `if ... call` drops the returned value
+                return self.line(rebuild(ins, args[2], args[3:], STATEMENTS.get(args[2])), constants, position, top)
+        if ins.name == 'call' and (lines := self.inline(args, constants, position)) is not None:
+            if not top:
+                return lines
+            return [Instruction(ins.line, 'inline', inst_inline, [args[0], tuple(args[1:]), tuple(lines)], f'{ins.text.rstrip()}  % inlined')] if lines else []
+        return [rebuild(ins, ins.name, args, ins.function) if args != ins.args else ins]
+
+    def inline(self, args: list, constants: dict[str, Value], position: int) -> (list[Instruction] | None):
+        callee, argv = args[0], args[1:]
+        if self.dynamic or not isinstance(callee, str) or callee in self.written:
+            return None
+        if Macros.resolve(callee, len(argv)) is not None:
+            return None # Already declared (a native, prelude or snapshot macro), the declaration in the program fails
+        if not all(isinstance(arg, (str, Value)) or (isinstance(arg, Slot) and arg.bare and arg.index != X) for arg in argv):
+            return None
+        definitions = self.definitions.get((callee, len(argv)), [])
+        if len(definitions) != 1 or definitions[0][1] >= position:
+            return None # Not defined yet, or more than once
+        mac = definitions[0][0]
+        body = mac.args[3]
+        if len(body) > INLINE_LINES or len(mac.args[4]) > 0 or any(isinstance(line, str) or calls_macros(line) for line in body):
+            return None
+        frame = Frame(Macro(callee, len(argv)), tuple(argv))
+        try:
+            lines = [substitute(line, frame) for line in body]
+        except AssertionError:
+            return None
+        return [line for substituted in lines for line in self.line(substituted, constants, position)]
+
+def optimize(code: list[Instruction]) -> list[Instruction]:
+    return Optimizer(code).optimize()
+
+# --dump-opt
+def dump_program(code: list[Instruction | str], depth: int = 0):
+    pad = '    ' * depth
+    for ins in code:
+        if isinstance(ins, str):
+            print(f'{pad}?: {ins.strip()}') # Formatted on every call
+            continue
+        print(f'{pad}{ins!r}')
+        if ins.name == 'mac':
+            dump_program(ins.args[4] + ins.args[3], depth + 1)
+            print(f'{pad}end')
+        elif ins.name == 'inline':
+            dump_program(list(ins.args[2]), depth + 1)
+
+# Error handling of the running program, modules loaded by USE report like it
+error_registry = False
+strict_errors = False
+
+def interpret(registry: bool, strict: bool):
+    global error_registry, strict_errors
+    error_registry, strict_errors = registry, strict
+    run_code(program)
+    OUTPUT.flush()
+    FILES.close_all()
+
+def run_code(code: list[Instruction]):
+    traced = HOOKS.active
+    for ins in code:
         if not RUNNING:
             break
         try:
-            evaluate_line(ln, file_content[ln])
-        except AssertionError as ass:
-            err = (f'ln -> {ln + 1}: {ass}')
+            if traced:
+                HOOKS.emit(ON_LINE, ins, None)
+            execute(ins)
+        except (AssertionError, RecursionError) as ass:
+            if isinstance(ass, RecursionError):
+                ass = ERROR_FORMAT('RECURSION ', 'CALL', 'Python stack exhausted', 'too many nested loops or expressions')
+            if traced:
+                HOOKS.emit(ON_ERROR, ins, str(ass))
+            err = (f'ln -> {ins.line + 1}: {ass}')
             if strict_errors:
-                print(err)
+                OUTPUT.write(f'{err}\n')
                 inst_exit_program(Value(-1))
             elif error_registry:
                 errors.append(err)
             else:
-                print(err)
-        file_lines_q = len(file_content)
-        ln += 1
-        
+                OUTPUT.write(f'{err}\n')
+
+# INTERPRETER
+# An independent interpreter state: variables, macros, used modules and the results of the last run.
+# The module level state is swapped for the interpreter's while it runs (and restored after),
+# so a process can keep many of them, one running at a time. Compiled modules are shared.
+# Threads take turns through RUN_LOCK, as sys.stdin and sys.stdout are swapped too.
+RUN_LOCK = RLock()
+
+class RunResult:
+    __slots__ = ('exit_code', 'output', 'warnings', 'errors')
+
+    def __init__(self, exit_code: int, output: str | None, warnings: list[str], errors: list[str]):
+        self.exit_code = exit_code
+        self.output = output     # None when written to a given stdout
+        self.warnings = warnings
+        self.errors = errors     # Only registered with error_registry, printed otherwise
+
+    def __repr__(self) -> str:
+        return f'RunResult(exit_code={self.exit_code}, {len(self.warnings)} warnings, {len(self.errors)} errors)'
+
+# Constants are never modified, so they are shared by every copy
+def copy_variables(variables: dict[str, Value]) -> dict[str, Value]:
+    return {name: value if value.const else Value(copy_value(value.value)) for name, value in variables.items()}
+
+def copy_macros(macros: dict[str, dict[int, Macro]]) -> MacroTable:
+    table = MacroTable()
+    table.update({name: dict(overloads) for name, overloads in macros.items()})
+    return table
+
+class Interpreter:
+    def __init__(self, optimized: bool = True, error_registry: bool = False, strict_errors: bool = False, max_depth: int = 1000, flush: str | None = None):
+        self.optimized = optimized
+        self.error_registry = error_registry
+        self.strict_errors = strict_errors
+        self.max_depth = max_depth
+        # State reset() goes back to, the prelude is part of it
+        self.initial = (INITIAL_VARIABLES, INITIAL_MACROS, {})
+        self.variables = copy_variables(INITIAL_VARIABLES)
+        self.macros = copy_macros(INITIAL_MACROS)
+        self.loaded: dict[str, list[tuple[str, int]]] = {}
+        self.program: list[Instruction] = []
+        self.warnings: list[str] = []
+        self.errors: list[str] = []
+        self.running = True
+        self.exit_code = 0
+        self.output = Output(policy=flush)
+        self.files = FileTable()
+        self.saved: list[tuple] = []
+
+    def __enter__(self):
+        global Variables, Macros, program, warnings, errors, RUNNING, EXIT_CODE, error_registry, strict_errors, MAX_CALL_DEPTH, OUTPUT, FILES
+        RUN_LOCK.acquire()
+        self.saved.append((Variables, Macros, program, warnings, errors, RUNNING, EXIT_CODE, error_registry, strict_errors, MAX_CALL_DEPTH, OUTPUT, FILES, MODULES.loaded))
+        Variables, Macros, program, warnings, errors = self.variables, self.macros, self.program, self.warnings, self.errors
+        OUTPUT, FILES = self.output, self.files
+        RUNNING, EXIT_CODE = self.running, self.exit_code
+        error_registry, strict_errors, MAX_CALL_DEPTH = self.error_registry, self.strict_errors, self.max_depth
+        MODULES.loaded = self.loaded
+        return self
+
+    def __exit__(self, *exception):
+        global Variables, Macros, program, warnings, errors, RUNNING, EXIT_CODE, error_registry, strict_errors, MAX_CALL_DEPTH, OUTPUT, FILES
+        self.running, self.exit_code = RUNNING, EXIT_CODE
+        try:
+            self.output.flush()
+        finally:
+            (Variables, Macros, program, warnings, errors, RUNNING, EXIT_CODE, error_registry, strict_errors, MAX_CALL_DEPTH, OUTPUT, FILES, MODULES.loaded) = self.saved.pop()
+            RUN_LOCK.release()
+
+    # Runs the prelude files (or restores their snapshot), reset() keeps what they leave
+    def prelude(self, modules: list[str], snapshot: str | None = None):
+        with self:
+            if snapshot is not None:
+                load_snapshot(snapshot, modules)
+            else:
+                for module in modules:
+                    inst_use_polang_file(module)
+        self.initial = (copy_variables(self.variables), copy_macros(self.macros), dict(self.loaded))
+
+    def reset(self):
+        variables, macros, loaded = self.initial
+        self.variables.clear()
+        self.variables.update(copy_variables(variables))
+        self.macros.clear()
+        self.macros.update(copy_macros(macros))
+        self.loaded.clear()
+        self.loaded.update(loaded)
+        self.files.close_all()
+        self.warnings.clear()
+        self.errors.clear()
+        self.running = True
+        self.exit_code = 0
+
+    def compile(self, lines: list[str]) -> list[Instruction]:
+        with self:
+            code = compile_source(lines)
+            return optimize(code) if self.optimized else code
+
+    # The source text, its lines or an os.PathLike file, or a file given by `path=`, argv is the ARGV list
+    def run(self, source: str | list[str] | os.PathLike | None = None, stdin: TextIO | str | None = None, stdout: TextIO | None = None, argv: list[str] | None = None, path: str | os.PathLike | None = None) -> RunResult:
+        assert (source is None) != (path is None), 'Expected a source or a path to run'
+        if path is not None or isinstance(source, os.PathLike):
+            lines = get_file_content(path if path is not None else source)
+        else:
+            lines = source.split('\n') if isinstance(source, str) else source
+        with RUN_LOCK: # sys.stdin is swapped before the interpreter is entered
+            self.warnings.clear()
+            self.errors.clear()
+            self.running = True
+            self.exit_code = 0
+            if argv is not None:
+                self.variables['ARGV'] = Value(list(argv))
+            self.program = self.compile(lines)
+            output = StringIO() if stdout is None else stdout
+            previous_stdin = sys.stdin
+            if stdin is not None:
+                sys.stdin = StringIO(stdin) if isinstance(stdin, str) else stdin
+            try:
+                with self, redirect_stdout(output):
+                    try:
+                        run_code(program)
+                    finally:
+                        OUTPUT.flush()
+                        FILES.close_all()
+            finally:
+                sys.stdin = previous_stdin
+            return RunResult(self.exit_code, output.getvalue() if stdout is None else None, list(self.warnings), list(self.errors))
+
+# BATCH
+# --batch=<directory | manifest> runs every .po file of the directory, or every file listed in
+# the manifest (one per line), on a pool of --jobs worker processes. Each worker keeps one
+# interpreter with the prelude loaded and resets it before every script.
+class BatchResult:
+    __slots__ = ('path', 'exit_code', 'output', 'stderr', 'warnings', 'errors', 'elapsed')
+
+    def __init__(self, path: str, result: RunResult, stderr: str, elapsed: float):
+        self.path = path
+        self.exit_code = result.exit_code
+        self.output = result.output
+        self.stderr = stderr
+        self.warnings = result.warnings
+        self.errors = result.errors
+        self.elapsed = elapsed
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def batch_scripts(batch: str) -> list[str]:
+    if os.path.isdir(batch):
+        return sorted(os.path.join(batch, name) for name in os.listdir(batch) if name.endswith(EXTENSION))
+    directory = os.path.dirname(batch)
+    lines = [line.strip() for line in get_file_content(batch)]
+    return [os.path.join(directory, line) for line in lines if line and not line.startswith('%')]
+
+worker: Interpreter | None = None
+
+def batch_worker_start(prelude: list[str], snapshot: str | None, optimized: bool, max_depth: int):
+    global worker
+    worker = Interpreter(optimized, error_registry=True, max_depth=max_depth)
+    if prelude or snapshot is not None:
+        worker.prelude(prelude, snapshot)
+
+def batch_run(path: str) -> BatchResult:
+    worker.reset()
+    stderr = StringIO()
+    start = perf_counter()
+    try:
+        with redirect_stderr(stderr):
+            result = worker.run(path=path, stdin='')
+    except (OSError, AssertionError) as error:
+        result = RunResult(-1, '', [], [str(error)])
+    except Exception as error: # Never ends the batch
+        result = RunResult(-1, '', [], [f'[BATCH ERROR] {type(error).__name__}: {error}'])
+    return BatchResult(path, result, stderr.getvalue(), perf_counter() - start)
+
+def run_batch(scripts: list[str], jobs: int, prelude: list[str], snapshot: str | None, optimized: bool, max_depth: int) -> list[BatchResult]:
+    from concurrent.futures import ProcessPoolExecutor # Only batches pay for it
+    with ProcessPoolExecutor(jobs, initializer=batch_worker_start, initargs=(prelude, snapshot, optimized, max_depth)) as pool:
+        return list(pool.map(batch_run, scripts))
+
+def report_batch(results: list[BatchResult], elapsed: float, jobs: int, show_warnings: bool, show_errors: bool):
+    print(f'BATCH: {len(results)} scripts on {jobs} workers in {elapsed:.3f} s')
+    print(f'{"exit":>5} {"time ms":>10} {"warnings":>9} {"errors":>7}  script')
+    for result in results:
+        print(f'{result.exit_code:>5} {result.elapsed * 1e3:>10.2f} {len(result.warnings):>9} {len(result.errors):>7}  {result.path}')
+        for w in result.warnings if show_warnings else []:
+            print(f'    [!] {w}')
+        for e in result.errors if show_errors else []:
+            print('    ' + e.strip().replace('\n', '\n    '))
+
+# SERVER
+# --serve=<socket> keeps --jobs worker processes with a warm interpreter (and the prelude loaded)
+# accepting connections on a Unix socket. A request is one JSON line:
+#   {"path": "<file.po>"} or {"source": "<text>"}, and optionally "argv": [...], "stdin": "<text>", "cwd": "<directory>"
+# answered with JSON lines, {"out": "<text>"} as the program writes and {"exit": <code>, "warnings": [...]} at the end.
+# Every request runs on a reset interpreter, workers that die are started again.
+# The socket, signal and json modules are only imported when serving.
+SERVER_CHUNK = 4096
+
+class SocketWriter:
+    def __init__(self, connection: 'socket.socket'):
+        self.connection = connection
+        self.pending: list[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= SERVER_CHUNK or '\n' in text:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            send_message(self.connection, {'out': ''.join(self.pending)})
+            self.pending.clear()
+            self.size = 0
+
+def send_message(connection: 'socket.socket', message: dict):
+    import json
+    connection.sendall(json.dumps(message).encode() + b'\n')
+
+def serve_request(connection: 'socket.socket', interpreter: Interpreter):
+    import json
+    with connection.makefile('rb') as file:
+        request = json.loads(file.readline())
+    assert isinstance(request, dict) and ('path' in request or 'source' in request), 'Expected {"path": ...} or {"source": ...}'
+    interpreter.reset()
+    cwd = os.getcwd()
+    writer = SocketWriter(connection)
+    try:
+        if 'cwd' in request: # USE paths are relative to the client
+            os.chdir(request['cwd'])
+        if 'path' in request:
+            result = interpreter.run(path=request['path'], stdin=request.get('stdin', ''), stdout=writer, argv=request.get('argv'))
+        else:
+            result = interpreter.run(str(request['source']), request.get('stdin', ''), writer, request.get('argv'))
+        writer.flush()
+        send_message(connection, {'exit': result.exit_code, 'warnings': result.warnings})
+    except (OSError, AssertionError) as error:
+        writer.flush()
+        send_message(connection, {'out': f'{error}\n'})
+        send_message(connection, {'exit': -1, 'warnings': []})
+    finally: # The next request starts where the worker did
+        os.chdir(cwd)
+
+def serve_worker(server: 'socket.socket', interpreter: Interpreter):
+    import signal
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        connection, _ = server.accept()
+        with connection:
+            try:
+                serve_request(connection, interpreter)
+            except BrokenPipeError:
+                pass # The client is gone
+            except Exception as error: # Never ends the worker
+                try:
+                    send_message(connection, {'out': f'[SERVER ERROR] {type(error).__name__}: {error}\n'})
+                    send_message(connection, {'exit': -1, 'warnings': []})
+                except OSError:
+                    pass
+
+def start_worker(server: 'socket.socket', interpreter: Interpreter) -> int:
+    if (pid := os.fork()) == 0:
+        try:
+            serve_worker(server, interpreter)
+        finally:
+            os._exit(1)
+    return pid
+
+def serve(path: str, jobs: int, interpreter: Interpreter):
+    import signal
+    import socket
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(128)
+    workers = {start_worker(server, interpreter) for _ in range(jobs)}
+    print(f'Serving on {path} with {jobs} workers (pid {os.getpid()})', flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: exit(0))
+    try:
+        while True:
+            pid, _ = os.wait()
+            if pid in workers:
+                workers.remove(pid)
+                workers.add(start_worker(server, interpreter))
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        server.close()
+        os.remove(path)
+
 def get_file_content(file_path: str):
     with open(file_path, 'r') as file:
         return file.read().split('\n')
@@ -625,37 +1817,121 @@ def display_usage():
     print('    --strict  :  Terminates the execution when an error is encounter.')
     print('    --warn    :  Displays all the warnings at the end of the execution.')
     print('    --error   :  Shows all the errors at the end of the execution.')
+    print('    --max-depth=<n>  :  Maximum of nested macro calls (default 1000).')
+    print('    --trace[=<level>]  :  Traces macro calls and errors to stderr, level 2 traces every line.')
+    print('    --lex-cache=<n>  :  Lines kept in the token cache (default 1024).')
+    print('    --no-opt    :  Runs the program without optimizing it.')
+    print('    --dump-opt  :  Prints the optimized program instead of running it.')
+    print('    --profile[=<file>] :  Reports time and counts per instruction, macro and line to stderr,')
+    print('                          or writes them to a .json file (pstats format otherwise).')
+    print('    --flush=<line|block|end>  :  When OUT is written, by line on a terminal and by block otherwise by default.')
+    print('    --prelude=<a.po>,<b.po>  :  Uses the files before the program.')
+    print('    --snapshot=<file>  :  Restores the state left by the prelude from the file, running it')
+    print('                          and writing the file when it is missing or any prelude file changed.\n')
+    print('    polang --batch=<directory | manifest> [options]  :  Runs many inputs on a process pool.\n')
+    print('BATCH OPTIONS:')
+    print('    --jobs=<n>  :  Worker processes (default one per core).')
+    print('    --report=<file.json>  :  Writes the output, errors and time of every input.')
+    print('    --prelude, --snapshot, --no-opt, --max-depth, --warn and --error apply to every input.\n')
+    print('    polang --serve=<socket> [options]  :  Runs the programs sent by client.py on --jobs workers.')
         
-def main(argc: int, argv: list[str]):    
+def main(argc: int, argv: list[str]) -> int:
     if argc == 1:
         display_usage()
         return 0
     
-    if argc >= 2:
-        assert (input_file := argv[1]).endswith(EXTENSION), ERROR_FORMAT('USAGE ', None, 'Input file', 'does not match with the ".po" extension.')
+    batch = argv[1].split('=', 1)[1] if argv[1].startswith('--batch=') else None
+    server = argv[1].split('=', 1)[1] if argv[1].startswith('--serve=') else None
+    assert batch is not None or server is not None or (input_file := argv[1]).endswith(EXTENSION), ERROR_FORMAT('USAGE ', None, 'Input file', 'does not match with the ".po" extension.')
     
-        global file_content
-        file_content = get_file_content(input_file)
-        
-        error_display = ('--error' in argv[2:])
-        strict_errors = ('--strict' in argv[2:])
+    interpreter = Interpreter(
+        optimized='--no-opt' not in argv[2:],
+        error_registry='--error' in argv[2:],
+        strict_errors='--strict' in argv[2:],
+    )
+    profiler = None
+    profile_path = None
+    snapshot_path = None
+    prelude = []
+    jobs = os.cpu_count() or 1
+    report_path = None
+    for option in argv[2:]:
+        if option.startswith('--max-depth='):
+            assert (depth := get_number(option.split('=', 1)[1])) is not None and depth > 0, ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+            interpreter.max_depth = int(depth)
+        elif option == '--trace' or option.startswith('--trace='):
+            level = get_number(option.split('=', 1)[1]) if '=' in option else 1
+            assert level is not None, ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+            Tracer(int(level)).install()
+        elif option.startswith('--lex-cache='):
+            assert (size := get_number(option.split('=', 1)[1])) is not None and size > 0, ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+            LEXER.maxsize = int(size)
+        elif option == '--profile' or option.startswith('--profile='):
+            profile_path = option.split('=', 1)[1] if '=' in option else None
+            profiler = Profiler()
+            profiler.install()
+        elif option.startswith('--snapshot='):
+            snapshot_path = option.split('=', 1)[1]
+        elif option.startswith('--prelude='):
+            prelude = [module for module in option.split('=', 1)[1].split(',') if module]
+            assert all(module.endswith(EXTENSION) for module in prelude), ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+        elif option.startswith('--flush='):
+            assert (policy := option.split('=', 1)[1]) in FLUSH_POLICIES, ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+            interpreter.output.policy = policy
+        elif option.startswith('--jobs='):
+            assert (count := get_number(option.split('=', 1)[1])) is not None and count > 0, ERROR_FORMAT('USAGE ', None, 'Invalid option', f'{option}')
+            jobs = int(count)
+        elif option.startswith('--report='):
+            report_path = option.split('=', 1)[1]
 
-        interpret(error_display, strict_errors)
+    if server is not None:
+        if snapshot_path is not None or prelude:
+            interpreter.prelude(prelude, snapshot_path)
+        serve(server, jobs, interpreter)
+        return 0
 
-        if '--warn' in argv[2:]:
-            for w in warnings:
-                print(f'[!] {w}')
-                
-        if error_display:
-            for e in errors:
-                print(e)
+    if batch is not None:
+        scripts = batch_scripts(batch)
+        if snapshot_path is not None: # Taken once, before the workers restore it
+            interpreter.prelude(prelude, snapshot_path)
+        start = perf_counter()
+        results = run_batch(scripts, jobs, prelude, snapshot_path, interpreter.optimized, interpreter.max_depth)
+        report_batch(results, perf_counter() - start, jobs, '--warn' in argv[2:], '--error' in argv[2:])
+        if report_path is not None:
+            import json
+            with open(report_path, 'w') as file:
+                json.dump([result.as_dict() for result in results], file, indent=2)
+        return int(any(result.exit_code != 0 or result.errors for result in results))
+
+    if snapshot_path is not None or prelude:
+        interpreter.prelude(prelude, snapshot_path)
+
+    if '--dump-opt' in argv[2:]:
+        dump_program(interpreter.compile(get_file_content(input_file)))
+        return 0
+
+    result = interpreter.run(path=input_file, stdout=sys.stdout)
+    
+    if profiler is not None:
+        profiler.finish()
+        if profile_path is None:
+            profiler.report()
+        else:
+            profiler.dump(profile_path)
+
+    if '--warn' in argv[2:]:
+        for w in result.warnings:
+            print(f'[!] {w}')
+            
+    for e in result.errors:
+        print(e)
     
-    exit(EXIT_CODE)
+    return result.exit_code
 
 from sys import argv
 
 if __name__ == '__main__':
     try:
-        main(len(argv), argv)
+        exit(main(len(argv), argv))
     except AssertionError as ass:
         print(ass)
\ No newline at end of file
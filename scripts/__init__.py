@@ -1,2 +1,10 @@
 from .errors import *
-from .value import *
\ No newline at end of file
+from .value import *
+from .instruction import *
+from .trace import *
+from .profiler import *
+from .lexer import *
+from .module import *
+from .snapshot import *
+from .output import *
+from .files import *
\ No newline at end of file
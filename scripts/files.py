@@ -0,0 +1,116 @@
+import mmap
+from array import array
+from typing import TextIO
+
+FILE_READ = 'r'
+FILE_WRITE = 'w'
+FILE_APPEND = 'a'
+FILE_MODES = [FILE_READ, FILE_WRITE, FILE_APPEND]
+WRITE_BUFFER = 1 << 20
+NUMBER_BLOCK = 1 << 24 # Bytes parsed at once by numbers()
+NUMBER_WIDTH = 16       # Bytes read for every number still wanted
+
+# A file opened by OPEN. Read files are memory mapped and read from `position`,
+# written ones go through a buffered text file flushed at EXIT and when closed.
+class FileHandle:
+    __slots__ = ('path', 'mode', 'file', 'map', 'position')
+
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self.position = 0
+        self.map: mmap.mmap | bytes | None = None
+        self.file: TextIO | None = None
+        if mode == FILE_READ:
+            with open(path, 'rb') as file:
+                try:
+                    self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError: # Empty files can not be mapped
+                    self.map = b''
+        else:
+            self.file = open(path, mode, encoding='utf-8', buffering=WRITE_BUFFER)
+
+    # The bytes left, None at the end of the file
+    def read(self) -> (bytes | None):
+        if self.position >= len(self.map):
+            return None
+        data = self.map[self.position:]
+        self.position = len(self.map)
+        return data
+
+    def line(self) -> (bytes | None):
+        if self.position >= len(self.map):
+            return None
+        end = self.map.find(b'\n', self.position)
+        end = len(self.map) if end < 0 else end + 1
+        data = self.map[self.position:end]
+        self.position = end
+        return data.rstrip(b'\r\n')
+
+    def range(self, start: int, size: int) -> bytes:
+        return self.map[start:start + size]
+
+    # Up to `limit` whitespace separated numbers from the position into the array, a block at a time
+    def numbers(self, target: array, limit: int | None = None) -> array:
+        size = len(self.map)
+        wanted = limit
+        while self.position < size and (wanted is None or wanted > 0):
+            block = NUMBER_BLOCK if wanted is None else min(NUMBER_BLOCK, max(4096, wanted * NUMBER_WIDTH))
+            end = min(self.position + block, size)
+            if end < size: # A block ends after a whole number
+                while end > self.position and not self.map[end - 1:end].isspace():
+                    end -= 1
+                if end == self.position:
+                    end = min(self.position + block, size)
+            data = self.map[self.position:end]
+            chunks = data.split() if wanted is None else data.split(None, wanted)
+            if wanted is not None and len(chunks) > wanted: # The last one is the rest of the block
+                end -= len(chunks.pop())
+            target.extend(map(float, chunks))
+            if wanted is not None:
+                wanted -= len(chunks)
+            self.position = end
+        return target
+
+    def write(self, text: str):
+        self.file.write(text)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+    def __repr__(self) -> str:
+        return f'{self.path}[{self.mode}]'
+
+# The open files of an interpreter by the number OPEN returned
+class FileTable:
+    def __init__(self):
+        self.handles: dict[int, FileHandle] = {}
+        self.next = 1
+
+    def open(self, path: str, mode: str) -> int:
+        handle = self.next
+        self.handles[handle] = FileHandle(path, mode)
+        self.next += 1
+        return handle
+
+    def get(self, handle) -> (FileHandle | None):
+        return self.handles.get(handle)
+
+    def close(self, handle: int):
+        self.handles.pop(handle).close()
+
+    def flush(self):
+        for file in self.handles.values():
+            file.flush()
+
+    def close_all(self):
+        for file in self.handles.values():
+            file.close()
+        self.handles.clear()
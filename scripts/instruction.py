@@ -0,0 +1,45 @@
+from types import FunctionType as function
+from .value import X, Value, Macro
+
+# A macro argument template: $n, or $* for every argument
+class Slot:
+    __slots__ = ('index', 'pieces', 'bare')
+
+    def __init__(self, index: int, pieces: list[str]):
+        self.index = index   # X for $*
+        self.pieces = pieces # Text around the placeholder: $1.value -> ['', '.value']
+        self.bare = pieces == ['', '']
+
+    def __repr__(self) -> str:
+        return ('$*' if self.index == X else f'${self.index}').join(self.pieces)
+
+# A pre-parsed polang line
+class Instruction:
+    __slots__ = ('line', 'name', 'function', 'args', 'text', 'nested', 'templated')
+
+    def __init__(self, line: int, name: str, function: function, args: list, text: str):
+        self.line = line
+        self.name = name
+        self.function = function
+        self.args = args
+        self.text = text
+        self.nested = any(isinstance(arg, Instruction) for arg in args)
+        self.templated = any(isinstance(arg, Slot) or (isinstance(arg, Instruction) and arg.templated) for arg in args)
+
+    def __repr__(self) -> str:
+        return f'{self.line + 1}: {self.text.strip()}'
+
+# A macro invocation: the selected overload and the arguments bound to its slots
+class Frame:
+    __slots__ = ('macro', 'argv', 'ip', 'target', 'discard', 'key')
+
+    def __init__(self, macro: Macro, argv: tuple[Value | str, ...], target: str | None = None, discard: bool = False, key: tuple | None = None):
+        self.macro = macro
+        self.argv = argv
+        self.ip = 0              # Next body line
+        self.target = target     # Variable receiving the return value (ZET)
+        self.discard = discard   # The return value is dropped (IF / NOT)
+        self.key = key           # Memo entry receiving the return value
+
+    def __repr__(self) -> str:
+        return f'{self.macro.name}{self.argv}'
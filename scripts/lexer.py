@@ -0,0 +1,102 @@
+import re
+from collections import OrderedDict
+from .errors import SYNTAX_ERROR, RAISE
+from .value import X
+
+# TOKEN KINDS
+TOKEN_NAME = 'name'
+TOKEN_NUMBER = 'number'
+TOKEN_STRING = 'string'
+TOKEN_NONE = 'none'   # .
+TOKEN_LIST = 'list'   # []
+TOKEN_OPEN = 'open'   # (
+TOKEN_CLOSE = 'close' # )
+TOKEN_SLOT = 'slot'   # $n or $* at the start of a word
+
+class Token:
+    __slots__ = ('kind', 'text', 'value')
+
+    def __init__(self, kind: str, text: str, value=None):
+        self.kind = kind
+        self.text = text   # As written in the line
+        self.value = value # Number, unescaped string or (slot index, text around it)
+
+    def __repr__(self) -> str:
+        return f'{self.kind}:{self.text}'
+
+# Strings may hold spaces and \' \\ \n \t escapes, words can not start with a quote
+SCANNER = re.compile(r"\s*(?:('(?:[^'\\]|\\.)*')|(\()|(\))|([^\s()'][^\s()]*)|(\S))")
+NUMBER_WORD = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+SLOT_WORD = re.compile(r'\$(\d+|\*)')
+ESCAPE = re.compile(r'\\(.)')
+ESCAPES = {'n': '\n', 't': '\t', '\'': '\'', '\\': '\\'}
+
+def unescape(match: re.Match) -> str:
+    return ESCAPES.get(match.group(1), match.group(0))
+
+NUMBER_START = set('+-.0123456789')
+
+# A whitespace free chunk of text
+def lex_word(word: str) -> Token:
+    first = word[0]
+    if first in NUMBER_START:
+        if word == '.':
+            return Token(TOKEN_NONE, word)
+        if NUMBER_WORD.fullmatch(word) is not None:
+            if word.lstrip('+-').isdigit():
+                return Token(TOKEN_NUMBER, word, int(word))
+            number = float(word)
+            return Token(TOKEN_NUMBER, word, int(number) if number.is_integer() else number)
+    elif first == '$':
+        if (match := SLOT_WORD.match(word)) is not None:
+            index = X if match.group(1) == '*' else int(match.group(1))
+            return Token(TOKEN_SLOT, word, (index, word.split(match.group(0))))
+    elif first == '[' and word[-1] == ']':
+        return Token(TOKEN_LIST, word)
+    elif first == '\'' and word[-1] == '\'' and len(word) > 1:
+        return Token(TOKEN_STRING, word, ESCAPE.sub(unescape, word[1:-1]))
+    return Token(TOKEN_NAME, word)
+
+def scan(line: str) -> tuple[Token, ...]:
+    tokens = []
+    for string, opening, closing, word, stray in SCANNER.findall(line.rstrip()):
+        if string:
+            tokens.append(Token(TOKEN_STRING, string, ESCAPE.sub(unescape, string[1:-1])))
+        elif opening:
+            tokens.append(Token(TOKEN_OPEN, opening))
+        elif closing:
+            tokens.append(Token(TOKEN_CLOSE, closing))
+        elif word:
+            tokens.append(lex_word(word))
+        else:
+            RAISE(SYNTAX_ERROR('String does not end', f'--> {line.strip()}', 'LEXER'))
+    return tuple(tokens)
+
+# Tokens of the last lexed lines by their exact text, least recently used lines are dropped
+class Lexer:
+    def __init__(self, maxsize: int = 1024):
+        self.cache: OrderedDict[str, tuple[Token, ...]] = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def tokenize(self, line: str) -> tuple[Token, ...]:
+        if (tokens := self.cache.get(line)) is not None:
+            self.hits += 1
+            self.cache.move_to_end(line)
+            return tokens
+        self.misses += 1
+        tokens = self.cache[line] = scan(line)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return tokens
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.cache), 'maxsize': self.maxsize}
+
+LEXER = Lexer()
@@ -0,0 +1,135 @@
+import os
+import pickle
+from types import FunctionType as function
+from array import array, _array_reconstructor
+from collections import OrderedDict
+from .value import Value, Rope, Macro, MacroTable, MemoCache
+from .instruction import Instruction, Slot
+
+# Compiled files (.poc) are written next to their module and are only trusted while
+# the module keeps its size and modification time, and the interpreter its signature.
+# They hold a header checked before the code is read, both pickled.
+COMPILED_FILE_EXTENSION = '.poc'
+COMPILED_FILE_FORMAT = 3
+
+class Module:
+    __slots__ = ('path', 'mtime', 'code')
+
+    def __init__(self, path: str, mtime: int, code: list):
+        self.path = path   # Resolved path
+        self.mtime = mtime # Of the compiled source
+        self.code = code   # Compiled instructions, never modified once stored
+
+    def __repr__(self) -> str:
+        return f'{self.path}[{len(self.code)}]'
+
+# USE
+# Modules compiled in this process by their resolved path,
+# and the ones already executed since the last reset with the macros they added
+class ModuleCache:
+    def __init__(self):
+        self.modules: dict[str, Module] = {}
+        self.loaded: dict[str, list[tuple[str, int]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, mtime: int) -> (Module | None):
+        if (module := self.modules.get(path)) is not None and module.mtime == mtime:
+            self.hits += 1
+            return module
+        self.misses += 1
+        return None
+
+    def add(self, module: Module):
+        self.modules[module.path] = module
+
+    # Every module can be used again, compiled modules are kept
+    def reset(self):
+        self.loaded.clear()
+
+    def clear(self):
+        self.modules.clear()
+        self.loaded.clear()
+        self.hits = 0
+        self.misses = 0
+
+MODULES = ModuleCache()
+
+def compiled_file_path(path: str) -> str:
+    return os.path.splitext(path)[0] + COMPILED_FILE_EXTENSION
+
+# Instruction functions are stored by name, so a compiled file
+# does not depend on how the interpreter module was imported
+class CodePickler(pickle.Pickler):
+    def __init__(self, file, functions: dict[str, function]):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.names = {id(func): name for name, func in functions.items()}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, function):
+            return self.names[id(obj)]
+        return None
+
+    def dump_sections(self, header: dict, body):
+        self.dump(header)
+        self.dump(body) # With the memo of the header, as the unpickler reads it
+
+# The only globals a compiled file or a snapshot can name, anything else could run code
+PICKLED_GLOBALS = {
+    (obj.__module__, obj.__name__): obj
+    for obj in [Value, Rope, Macro, MacroTable, MemoCache, Instruction, Slot, array, _array_reconstructor, OrderedDict]
+}
+
+class CodeUnpickler(pickle.Unpickler):
+    def __init__(self, file, functions: dict[str, function]):
+        super().__init__(file)
+        self.functions = functions
+
+    def persistent_load(self, name: str):
+        if (func := self.functions.get(name)) is None:
+            raise pickle.UnpicklingError(f'Unknown instruction function {name}')
+        return func
+
+    def find_class(self, module: str, name: str):
+        if (obj := PICKLED_GLOBALS.get((module, name))) is None:
+            raise pickle.UnpicklingError(f'Forbidden global {module}.{name}')
+        return obj
+
+    # The header of the file, a dict of plain values
+    def load_header(self) -> (dict | None):
+        header = self.load()
+        return header if isinstance(header, dict) else None
+
+# The compiled code of a module, or None when missing or stale
+def load_code(path: str, stat: os.stat_result, signature: str, functions: dict[str, function]) -> (list | None):
+    try:
+        with open(compiled_file_path(path), 'rb') as file:
+            unpickler = CodeUnpickler(file, functions)
+            header = unpickler.load_header()
+            if header is None or header.get('format') != COMPILED_FILE_FORMAT or header.get('signature') != signature:
+                return None
+            if header.get('size') != stat.st_size or header.get('mtime') != stat.st_mtime_ns:
+                return None
+            code = unpickler.load()
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+        return None
+    return code if isinstance(code, list) else None
+
+# Read only directories just don't get a compiled file
+def save_code(path: str, stat: os.stat_result, signature: str, functions: dict[str, function], code: list):
+    header = {'format': COMPILED_FILE_FORMAT, 'signature': signature, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    try:
+        write_replacing(compiled_file_path(path), lambda file: CodePickler(file, functions).dump_sections(header, code))
+    except (OSError, pickle.PicklingError, KeyError):
+        pass
+
+# Processes reading the file while it is written see the old one or the new one
+def write_replacing(path: str, write):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as file:
+            write(file)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -0,0 +1,47 @@
+import sys
+from typing import TextIO
+
+# --flush=line|block|end
+FLUSH_LINE = 'line'   # When a line ends
+FLUSH_BLOCK = 'block' # When the buffer is full
+FLUSH_END = 'end'     # At EXIT or when the program ends
+FLUSH_POLICIES = [FLUSH_LINE, FLUSH_BLOCK, FLUSH_END]
+BLOCK_SIZE = 8192
+
+# Buffer of everything OUT writes. Without a sink it writes to the sys.stdout of the moment
+# it is flushed, so redirected output keeps working. Reading input always flushes it first.
+class Output:
+    def __init__(self, sink: TextIO | None = None, policy: str | None = None, block: int = BLOCK_SIZE):
+        self.sink = sink
+        self.policy = policy # None: by line on a terminal, by block otherwise
+        self.block = block
+        self.chunks: list[str] = []
+        self.size = 0
+        self.checked: TextIO | None = None # Stream the automatic policy was chosen for
+        self.automatic = FLUSH_BLOCK
+
+    def write(self, text: str):
+        self.chunks.append(text)
+        self.size += len(text)
+        policy = self.policy if self.policy is not None else self.automatic_policy()
+        if (policy == FLUSH_LINE and '\n' in text) or (policy == FLUSH_BLOCK and self.size >= self.block):
+            self.flush()
+
+    def stream(self) -> TextIO:
+        return self.sink if self.sink is not None else sys.stdout
+
+    def automatic_policy(self) -> str:
+        if (stream := self.stream()) is not self.checked:
+            isatty = getattr(stream, 'isatty', None)
+            self.checked = stream
+            self.automatic = FLUSH_LINE if isatty is not None and isatty() else FLUSH_BLOCK
+        return self.automatic
+
+    def flush(self):
+        if not self.chunks:
+            return
+        stream = self.stream()
+        stream.write(''.join(self.chunks))
+        stream.flush()
+        self.chunks.clear()
+        self.size = 0
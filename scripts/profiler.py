@@ -0,0 +1,132 @@
+import marshal
+from sys import stderr
+from time import perf_counter
+from typing import TextIO
+from .trace import Hooks, HOOKS, ON_LINE, ON_CALL, ON_RETURN
+from .lexer import LEXER
+
+class Stat:
+    __slots__ = ('count', 'inclusive', 'exclusive', 'active')
+
+    def __init__(self):
+        self.count = 0
+        self.inclusive = 0.0 # Recursive activations are only counted once
+        self.exclusive = 0.0
+        self.active = 0
+
+    def as_dict(self) -> dict:
+        return {'count': self.count, 'inclusive': self.inclusive, 'exclusive': self.exclusive}
+
+# The program or an active macro frame, with the line it is running
+class Activation:
+    __slots__ = ('macro', 'start', 'child', 'line', 'line_start', 'line_child')
+
+    def __init__(self, macro: str | None, start: float):
+        self.macro = macro
+        self.start = start
+        self.child = 0.0
+        self.line = None
+        self.line_start = 0.0
+        self.line_child = 0.0
+
+# --profile[=path]
+# Call counts, inclusive and exclusive wall time per instruction, macro and source line
+class Profiler:
+    def __init__(self):
+        self.instructions: dict[str, Stat] = {}
+        self.macros: dict[str, Stat] = {}
+        self.lines: dict[str, Stat] = {}
+        self.max_depth = 0
+        self.stack = [Activation(None, perf_counter())]
+
+    def record(self, table: dict[str, Stat], key: str, elapsed: float, own: float):
+        stat = table[key]
+        stat.count += 1
+        stat.exclusive += own
+        stat.active -= 1
+        if stat.active == 0:
+            stat.inclusive += elapsed
+
+    def enter(self, table: dict[str, Stat], key: str):
+        if (stat := table.get(key)) is None:
+            stat = table[key] = Stat()
+        stat.active += 1
+
+    def close_line(self, activation: Activation, now: float):
+        if (ins := activation.line) is None:
+            return
+        elapsed = now - activation.line_start
+        own = elapsed - activation.line_child
+        self.record(self.instructions, ins.name, elapsed, own)
+        self.record(self.lines, line_key(ins), elapsed, own)
+        activation.line = None
+
+    def on_line(self, ins, frame):
+        now = perf_counter()
+        activation = self.stack[-1]
+        self.close_line(activation, now)
+        self.enter(self.instructions, ins.name)
+        self.enter(self.lines, line_key(ins))
+        activation.line = ins
+        activation.line_start = now
+        activation.line_child = 0.0
+
+    def on_call(self, frame):
+        key = f'{frame.macro.name}({frame.macro.argc})'
+        self.enter(self.macros, key)
+        self.stack.append(Activation(key, perf_counter()))
+        self.max_depth = max(self.max_depth, len(self.stack) - 1)
+
+    def on_return(self, frame, value):
+        now = perf_counter()
+        activation = self.stack.pop()
+        self.close_line(activation, now)
+        elapsed = now - activation.start
+        self.record(self.macros, activation.macro, elapsed, elapsed - activation.child)
+        caller = self.stack[-1]
+        caller.child += elapsed
+        caller.line_child += elapsed
+
+    def install(self, hooks: Hooks = HOOKS):
+        hooks.add(ON_LINE, self.on_line)
+        hooks.add(ON_CALL, self.on_call)
+        hooks.add(ON_RETURN, self.on_return)
+
+    def finish(self):
+        self.close_line(self.stack[0], perf_counter())
+
+    def as_dict(self) -> dict:
+        return {
+            'max_depth': self.max_depth,
+            'lexer': LEXER.info(),
+            'instructions': {key: stat.as_dict() for key, stat in self.instructions.items()},
+            'macros': {key: stat.as_dict() for key, stat in self.macros.items()},
+            'lines': {key: stat.as_dict() for key, stat in self.lines.items()},
+        }
+
+    def report(self, stream: TextIO = stderr, limit: int = 20):
+        print(f'PROFILE (ms, sorted by exclusive time), max call depth: {self.max_depth}', file=stream)
+        lexer = LEXER.info()
+        print(f'Lexer cache: {lexer["hits"]} hits, {lexer["misses"]} misses, {lexer["size"]}/{lexer["maxsize"]} lines', file=stream)
+        for title, table in [('MACROS', self.macros), ('INSTRUCTIONS', self.instructions), ('LINES', self.lines)]:
+            print(f'\n{title}', file=stream)
+            print(f'{"count":>10} {"inclusive":>12} {"exclusive":>12}  name', file=stream)
+            for key, stat in sorted(table.items(), key=lambda item: item[1].exclusive, reverse=True)[:limit]:
+                print(f'{stat.count:>10} {stat.inclusive * 1e3:>12.3f} {stat.exclusive * 1e3:>12.3f}  {key}', file=stream)
+
+    # .json files get the raw tables, anything else is written in pstats format
+    def dump(self, path: str):
+        if path.endswith('.json'):
+            import json
+            with open(path, 'w') as file:
+                json.dump(self.as_dict(), file, indent=2)
+            return
+        stats = {}
+        for kind, table in [('<macro>', self.macros), ('<instruction>', self.instructions), ('<line>', self.lines)]:
+            for key, stat in table.items():
+                stats[(kind, 0, key)] = (stat.count, stat.count, stat.exclusive, stat.inclusive, {})
+        with open(path, 'wb') as file:
+            marshal.dump(stats, file)
+
+def line_key(ins) -> str:
+    return f'{ins.line + 1}: {ins.text.strip()}'
@@ -0,0 +1,46 @@
+import os
+import hashlib
+import pickle
+from types import FunctionType as function
+from .module import CodePickler, CodeUnpickler, write_replacing
+
+# --snapshot=<file> [--prelude=<a.po>,<b.po>]
+# The variables, macros and used modules left by running the prelude files.
+# A snapshot is only restored for the same interpreter version and instruction
+# table, and while every prelude file and every module it used keeps the
+# content it was taken with, which the header of the file is checked for
+# before the state is unpickled.
+SNAPSHOT_FORMAT = 4
+
+def source_hash(path: str) -> str:
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return ''
+
+def source_hashes(prelude: list[str]) -> dict[str, str]:
+    return {os.path.realpath(path): source_hash(path) for path in prelude}
+
+# The header of the snapshot, with the state only when it is fresh and can be read
+def read_snapshot(path: str, functions: dict[str, function], signature: str) -> (dict | None):
+    header = None
+    try:
+        with open(path, 'rb') as file:
+            unpickler = CodeUnpickler(file, functions)
+            header = unpickler.load_header()
+            if header is None or header.get('format') != SNAPSHOT_FORMAT:
+                return None
+            if snapshot_fresh(header, signature) and isinstance(state := unpickler.load(), dict):
+                header['state'] = state
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+        pass # A header that was read still names the prelude to rebuild the snapshot with
+    return header
+
+def snapshot_fresh(header: dict, signature: str) -> bool:
+    return header.get('signature') == signature and header.get('sources') == source_hashes(list(header.get('sources', {})))
+
+def write_snapshot(path: str, signature: str, functions: dict[str, function], prelude: list[str], state: dict):
+    sources = source_hashes([*prelude, *state['modules']])
+    header = {'format': SNAPSHOT_FORMAT, 'signature': signature, 'prelude': prelude, 'sources': sources}
+    write_replacing(path, lambda file: CodePickler(file, functions).dump_sections(header, state))
@@ -0,0 +1,62 @@
+from sys import stderr
+from typing import TextIO, Callable
+
+# INTERPRETER EVENTS
+ON_LINE = 'line'     # (instruction, frame | None) before a line is executed
+ON_CALL = 'call'     # (frame) when a macro frame is entered
+ON_RETURN = 'return' # (frame, value) when a macro frame is left
+ON_ERROR = 'error'   # (instruction, message) when a line fails
+
+# Hooks are only looked at when `active` is set, the interpreter
+# checks it once per program or frame stack instead of once per line
+class Hooks:
+    def __init__(self):
+        self.events: dict[str, list[Callable]] = {ON_LINE: [], ON_CALL: [], ON_RETURN: [], ON_ERROR: []}
+        self.active = False
+
+    def add(self, event: str, hook: Callable):
+        self.events[event].append(hook)
+        self.active = True
+
+    def remove(self, event: str, hook: Callable):
+        self.events[event].remove(hook)
+        self.active = any(self.events.values())
+
+    def emit(self, event: str, *args):
+        for hook in self.events[event]:
+            hook(*args)
+
+HOOKS = Hooks()
+
+# --trace[=level]
+#   1: macro calls, returns and errors
+#   2: every executed line too
+class Tracer:
+    def __init__(self, level: int = 1, stream: TextIO = stderr):
+        self.level = level
+        self.stream = stream
+        self.depth = 0
+
+    def write(self, message: str):
+        print(f'[TRACE] {"  " * self.depth}{message}', file=self.stream)
+
+    def on_line(self, ins, frame):
+        self.write(f'{ins}')
+
+    def on_call(self, frame):
+        self.write(f'> {frame.macro.name}({frame.macro.argc}) {" ".join(str(arg) for arg in frame.argv)}')
+        self.depth += 1
+
+    def on_return(self, frame, value):
+        self.depth = max(0, self.depth - 1)
+        self.write(f'< {frame.macro.name} -> {value if value is not None else "none"}')
+
+    def on_error(self, ins, message: str):
+        self.write(f'! {message.strip()}')
+
+    def install(self, hooks: Hooks = HOOKS):
+        if self.level >= 2:
+            hooks.add(ON_LINE, self.on_line)
+        hooks.add(ON_CALL, self.on_call)
+        hooks.add(ON_RETURN, self.on_return)
+        hooks.add(ON_ERROR, self.on_error)
@@ -1,31 +1,76 @@
 from types import FunctionType as function
+from operator import attrgetter
+from array import array
+from collections import OrderedDict
 
 # POLANG TYPE SUPPORT
 Number = int | float
-Any = str | Number | list | None
+Any = str | Number | list | array | None
 STRING = 'string'
 NUMBER = 'number'
 LIST = 'list'
+ARRAY = 'array' # Packed floats
 NONE = 'none'
 ANY = 'any'
+X = -1 # Variadic argument count
+
+TYPES: dict[type, str] = {
+    int: NUMBER,
+    float: NUMBER,
+    str: STRING,
+    list: LIST,
+    array: ARRAY,
+    type(None): NONE,
+}
 
 # A polang value representation
+# The type tag is stored, and only recomputed when `value` is assigned.
+# A STRING edited by ADD or ASSIGN keeps its text in a rope until it is read.
 class Value:
+    __slots__ = ('_value', 'type', 'const', 'rope')
+    
     def __init__(self, value: Any = None, const: bool = False):
-        self.value = value
+        self._value = value
+        self.type = TYPES.get(type(value), ANY)
         self.const = const
-        
-    @property
-    def type(self):
-        if self.value is None:
-            return NONE
-        if type(self.value) in [int, float]:
-            return NUMBER
-        if isinstance(self.value, str):
-            return STRING
-        if isinstance(self.value, list):
-            return LIST
-        return ANY
+        self.rope: Rope | None = None
+    
+    def _get_value(self) -> Any:
+        return self._value if self.rope is None else self.join_text()
+
+    def _set_value(self, value: Any):
+        self._value = value
+        self.type = TYPES.get(type(value), ANY)
+        self.rope = None
+    
+    value = property(_get_value, _set_value)
+
+    def join_text(self) -> str:
+        rope = self.rope
+        if rope.text is None:
+            rope.text = ''.join(rope.chunks)
+        self._value = rope.text
+        if not rope.chars: # The next ADD starts a rope from the text
+            self.rope = None
+        return self._value
+
+    def append_text(self, pieces: list[str]):
+        if (rope := self.rope) is None:
+            rope = self.rope = Rope([self._value], False)
+        rope.chunks.extend(pieces)
+        rope.text = None
+        rope.chars = rope.chars and all(len(piece) == 1 for piece in pieces)
+
+    def char(self, index: int) -> str:
+        rope = self.rope
+        return rope.chunks[index] if rope is not None and rope.chars else self.value[index]
+
+    def assign_char(self, index: int, text: str):
+        if (rope := self.rope) is None or not rope.chars:
+            rope = self.rope = Rope(list(self.value), True)
+        rope.chunks[index] = text
+        rope.text = None
+        rope.chars = len(text) == 1
         
     def __repr__(self) -> str:
         return f'({self.value}: {self.type})'
@@ -33,13 +78,87 @@ class Value:
     def __str__(self) -> str:
         if self.value is None:
             return 'none'
+        if self.type == ARRAY: # Whole items are shown as integers, as they are read back
+            return str([int(item) if item.is_integer() else item for item in self.value])
         return str(self.value)
     
+# The pieces of a STRING being built: ADD appends chunks and ASSIGN edits
+# a list of characters, they are only joined when the whole text is read
+class Rope:
+    __slots__ = ('chunks', 'text', 'chars')
+
+    def __init__(self, chunks: list[str], chars: bool):
+        self.chunks = chunks
+        self.text: str | None = None # Joined chunks, None when out of date
+        self.chars = chars           # Every chunk is a single character
+
+# Shared constant Values: none and small numbers. Strings are not shared,
+# a long running process would keep every distinct one it ever lexed.
+CONSTANTS: dict[tuple[type, Any], Value] = {}
+SHARED_INTS = range(-5, 257)
+
+def constant(value: Any) -> Value:
+    if value is None or (type(value) is int and value in SHARED_INTS):
+        if (shared := CONSTANTS.get((type(value), value))) is None:
+            shared = CONSTANTS[(type(value), value)] = Value(value, True)
+        return shared
+    return Value(value, True)
+    
+# Results of a memoized macro by its arguments, the least recently used are evicted
+class MemoCache:
+    def __init__(self, capacity: int = 128):
+        self.results: OrderedDict[tuple, Any] = OrderedDict()
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key: tuple) -> tuple[bool, Any]:
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return True, self.results[key]
+        self.misses += 1
+        return False, None
+
+    def store(self, key: tuple, result: Any):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.capacity:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def __repr__(self) -> str:
+        return f'memo[{self.hits} hits, {self.misses} misses, {self.evictions} evictions, {len(self.results)}/{self.capacity}]'
+
 class Macro:
-    def __init__(self, name: str, argc: int, code: list[str] = []):
+    def __init__(self, name: str, argc: int, code: list[str] | None = None, body: list | None = None, native: function | None = None):
         self.name = name
         self.argc = argc
-        self.code = code
+        self.code = code if code is not None else []
+        self.body = body if body is not None else []
+        self.native = native # Implemented by the interpreter
+        self.memo: MemoCache | None = None
         
     def __repr__(self) -> str:
-        return f'{self.name}({self.argc})[{len(self.code)}]'
\ No newline at end of file
+        memo = f' {self.memo}' if self.memo is not None else ''
+        return f'{self.name}({self.argc})[{"native" if self.native is not None else len(self.code)}]{memo}'
+
+# Macros indexed by name, then by argument count
+class MacroTable(dict[str, dict[int, Macro]]):
+    def __init__(self, macros: list[Macro] | None = None):
+        super().__init__()
+        for mac in macros or []:
+            self.add(mac)
+    
+    def add(self, macro: Macro):
+        self.setdefault(macro.name, {})[macro.argc] = macro
+    
+    # An exact argument count wins over the variadic overload
+    def resolve(self, name: str, argc: int) -> (Macro | None):
+        if (overloads := self.get(name)) is None:
+            return None
+        return overloads.get(argc, overloads.get(X))
+    
+    def macros(self) -> list[Macro]:
+        return [self[name][argc] for name in sorted(self) for argc in sorted(self[name])]
\ No newline at end of file